@@ -0,0 +1,85 @@
+"""Compare HTML extractor backends on the saved pages in benchmarks/corpus/html.
+
+Usage: python -m benchmarks.html_extractor_benchmark [--repeat N] [--memory]
+"""
+import argparse
+import time
+import tracemalloc
+from pathlib import Path
+from services import html_extractor_service
+
+CORPUS_DIR = Path(__file__).resolve().parent / "corpus" / "html"
+BASELINE = "beautifulsoup"
+
+
+def time_extractor(extract, html, repeat):
+    best = float("inf")
+    output = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = extract(html)
+        best = min(best, time.perf_counter() - start)
+    return best, output
+
+
+def peak_memory(extract, html):
+    tracemalloc.start()
+    extract(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--memory", action="store_true", help="also report peak Python heap usage")
+    args = parser.parse_args()
+
+    pages = sorted(CORPUS_DIR.glob("*.html"))
+    if not pages:
+        raise SystemExit(f"No HTML pages found in {CORPUS_DIR}")
+
+    header = f"{'page':<30} {'extractor':<14} {'KB':>7} {'ms':>9} {'MB/s':>8} {'speedup':>8} {'same':>5}"
+    if args.memory:
+        header += f" {'peak MB':>8}"
+    print(header)
+
+    totals = {name: 0.0 for name in html_extractor_service.EXTRACTORS}
+    total_bytes = 0
+    mismatches = 0
+    for page in pages:
+        html = page.read_text(encoding="utf-8")
+        size = len(html.encode("utf-8"))
+        total_bytes += size
+        baseline_time, baseline_output = time_extractor(
+            html_extractor_service.get_extractor(BASELINE), html, args.repeat
+        )
+        for name, extract in html_extractor_service.EXTRACTORS.items():
+            if name == BASELINE:
+                elapsed, output = baseline_time, baseline_output
+            else:
+                elapsed, output = time_extractor(extract, html, args.repeat)
+            totals[name] += elapsed
+            same = output == baseline_output
+            mismatches += not same
+            row = (
+                f"{page.name:<30} {name:<14} {size / 1024:>7.0f} {elapsed * 1000:>9.2f} "
+                f"{size / elapsed / 1e6:>8.1f} {baseline_time / elapsed:>7.1f}x {'yes' if same else 'NO':>5}"
+            )
+            if args.memory:
+                row += f" {peak_memory(extract, html) / 1e6:>8.1f}"
+            print(row)
+
+    print()
+    for name, elapsed in totals.items():
+        print(
+            f"{name:<14} total {elapsed * 1000:>9.2f} ms, {total_bytes / elapsed / 1e6:.1f} MB/s, "
+            f"{totals[BASELINE] / elapsed:.1f}x vs {BASELINE}"
+        )
+    if mismatches:
+        print(f"{mismatches} extractor outputs differ from {BASELINE}")
+
+
+if __name__ == "__main__":
+    main()
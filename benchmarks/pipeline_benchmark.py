@@ -0,0 +1,186 @@
+"""Run the full report + index pipeline offline against recorded fixtures.
+
+Record fixtures once with live credentials (--record), then replay them as
+often as needed without network access. Every run starts from empty caches so
+all stages do real work, and reports per-stage wall time, throughput and peak
+memory. Tracing Python allocations slows the pipeline down, so the peak heap is
+measured in one extra run after the timed ones.
+
+Usage:
+    python -m benchmarks.pipeline_benchmark --record
+    python -m benchmarks.pipeline_benchmark [--latency 0.05] [--llm-latency 1.5] [--repeat 3] [--no-heap]
+"""
+import argparse
+import asyncio
+import functools
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class StageTimer:
+    """Collects call counts, busy time and first-start/last-end spans per stage."""
+
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def _record(self, stage, started, ended):
+        with self._lock:
+            entry = self.stages.setdefault(
+                stage, {"calls": 0, "busy": 0.0, "first": started, "last": ended}
+            )
+            entry["calls"] += 1
+            entry["busy"] += ended - started
+            entry["first"] = min(entry["first"], started)
+            entry["last"] = max(entry["last"], ended)
+
+    def wrap(self, module, name, stage=None):
+        original = getattr(module, name)
+        stage = stage or name
+        if asyncio.iscoroutinefunction(original):
+
+            @functools.wraps(original)
+            async def timed(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await original(*args, **kwargs)
+                finally:
+                    self._record(stage, started, time.perf_counter())
+
+        else:
+
+            @functools.wraps(original)
+            def timed(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    self._record(stage, started, time.perf_counter())
+
+        setattr(module, name, timed)
+
+
+def instrument(timer):
+    from controllers import report_controller
+    from services import (
+        google_api_service,
+        json_logger_service,
+        rag_service,
+        scraper_service,
+        url_service,
+    )
+
+    timer.wrap(report_controller, "fetch_hackernews_top_stories", "hackernews")
+    timer.wrap(report_controller, "fetch_google_api_top_stories", "google")
+    timer.wrap(google_api_service, "classify_urls", "url validation")
+    timer.wrap(url_service, "canonicalize_articles", "canonicalize")
+    timer.wrap(report_controller, "fetch_article_content", "scrape")
+    timer.wrap(scraper_service, "fetch_with_httpx_bs", "scrape: httpx")
+    timer.wrap(scraper_service, "fetch_with_selenium", "scrape: selenium")
+    timer.wrap(report_controller, "process_article", "llm")
+    timer.wrap(report_controller, "write_report_to_csv", "csv")
+    timer.wrap(json_logger_service, "write_report_to_json", "json")
+    timer.wrap(rag_service, "index_articles_from_json", "index")
+
+
+async def run_pipeline(logger):
+    from controllers import report_controller
+    from services import http_client_service, rag_service
+
+    async with http_client_service.http_client_session(logger=logger):
+        rag_service.initialize_vectorstore(logger=logger)
+        report = await report_controller.generate_tech_trends_report(logger)
+    return report
+
+
+def print_report(timer, elapsed, report):
+    print(f"\n{'stage':<18} {'calls':>6} {'wall s':>9} {'busy s':>9}")
+    for stage, entry in timer.stages.items():
+        print(
+            f"{stage:<18} {entry['calls']:>6} {entry['last'] - entry['first']:>9.2f} {entry['busy']:>9.2f}"
+        )
+    scraped = timer.stages.get("scrape", {}).get("calls", 0)
+    processed = timer.stages.get("llm", {}).get("calls", 0)
+    print(
+        f"\ntotal {elapsed:.2f}s | {scraped} scraped, {processed} LLM calls, "
+        f"{len(report.items)} accepted | {scraped / elapsed:.1f} articles/s"
+    )
+    if resource:
+        # ru_maxrss is in KiB on Linux and bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        max_rss_mb = max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+        print(f"max RSS {max_rss_mb:.1f} MB")
+
+
+def use_fresh_caches(cache_dir):
+    """Point every cache at an empty directory so each stage does its full work."""
+    from services import cache_db_service, llm_batch_service, rag_service
+
+    cache_db_service.close_all()
+    # Paths under the cache are bound at import, so each one is moved too
+    cache_db_service.CACHE_DIR = cache_dir
+    rag_service.VECTORSTORE_DIR = cache_dir / "vectorstore"
+    llm_batch_service.BATCH_DIR = cache_dir / "batches"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--record", action="store_true", help="run live and record fixtures")
+    parser.add_argument("--fixtures", help="fixture directory (default benchmarks/fixtures)")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per replayed HTTP response")
+    parser.add_argument("--llm-latency", type=float, help="seconds per replayed OpenAI response")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument(
+        "--no-heap", action="store_true", help="skip the extra run that measures the peak heap"
+    )
+    args = parser.parse_args()
+
+    # Settings are read at import time, so they must be in place before the
+    # services are imported
+    os.environ["REPLAY_MODE"] = "record" if args.record else "replay"
+    os.environ["REPLAY_LATENCY"] = str(args.latency)
+    if args.llm_latency is not None:
+        os.environ["REPLAY_LLM_LATENCY"] = str(args.llm_latency)
+    if args.fixtures:
+        os.environ["REPLAY_DIR"] = args.fixtures
+    if not args.record:
+        os.environ.setdefault("OPENAI_API_KEY", "replay")
+        os.environ.setdefault("GOOGLE_API_KEY", "replay")
+    work_dir = tempfile.mkdtemp(prefix="pipeline-benchmark-")
+    os.environ["REPORTS_DIR"] = os.path.join(work_dir, "reports")
+
+    os.environ["CACHE_DIR"] = os.path.join(work_dir, "cache-0")
+    from logger import logger
+
+    timer = StageTimer()
+    instrument(timer)
+    for run in range(args.repeat):
+        use_fresh_caches(Path(work_dir) / f"cache-{run}")
+        timer.stages.clear()
+        started = time.perf_counter()
+        report = asyncio.run(run_pipeline(logger))
+        elapsed = time.perf_counter() - started
+        print(f"\n=== run {run + 1}/{args.repeat} ({os.environ['REPLAY_MODE']}) ===")
+        print_report(timer, elapsed, report)
+
+    if not args.no_heap and not args.record:
+        use_fresh_caches(Path(work_dir) / "cache-heap")
+        tracemalloc.start()
+        asyncio.run(run_pipeline(logger))
+        _, peak_heap = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"\npeak Python heap {peak_heap / 1024 / 1024:.1f} MB (separate traced run)")
+
+
+if __name__ == "__main__":
+    main()
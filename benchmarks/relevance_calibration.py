@@ -0,0 +1,110 @@
+"""Calibrate RELEVANCE_THRESHOLD against the LLM's decisions in past reports.
+
+Every Accepted/Rejected article in logs/*.json is scored with the local
+relevance prefilter. For each candidate threshold the tool reports how many
+LLM rejections the prefilter would have caught (recall), how many of its
+rejections the LLM agreed with (precision) and how many accepted articles it
+would have lost.
+
+Usage: python -m benchmarks.relevance_calibration [--logs DIR] [--max-lost 0.02]
+"""
+import argparse
+import json
+from pathlib import Path
+import numpy as np
+from services import relevance_service
+from services.json_logger_service import REPORTS_DIR
+
+
+def load_decisions(logs_dir):
+    """Latest LLM decision per source URL as (score, accepted) pairs."""
+    decisions = {}
+    for path in sorted(logs_dir.glob("*.json")):
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        for entry in entries:
+            logging = entry.get("logging", {})
+            metadata = entry.get("metadata", {})
+            status = logging.get("status")
+            if status not in ("Accepted", "Rejected"):
+                continue
+            if logging.get("reason", "").startswith(relevance_service.PREFILTER_REASON_PREFIX):
+                continue
+            content = metadata.get("raw_content", "")
+            if not content:
+                continue
+            decisions[metadata.get("source", "")] = (
+                content,
+                metadata.get("title", ""),
+                status == "Accepted",
+            )
+    return [
+        (relevance_service.relevance_score(content, title), accepted)
+        for content, title, accepted in decisions.values()
+    ]
+
+
+def evaluate(scores, accepted, threshold):
+    flagged = scores < threshold
+    caught = int(np.sum(flagged & ~accepted))
+    lost = int(np.sum(flagged & accepted))
+    rejected_total = int(np.sum(~accepted))
+    accepted_total = int(np.sum(accepted))
+    return {
+        "threshold": threshold,
+        "prefiltered": int(np.sum(flagged)),
+        "precision": caught / (caught + lost) if caught + lost else 1.0,
+        "recall": caught / rejected_total if rejected_total else 0.0,
+        "lost": lost / accepted_total if accepted_total else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logs", type=Path, default=REPORTS_DIR)
+    parser.add_argument(
+        "--max-lost",
+        type=float,
+        default=0.02,
+        help="largest share of accepted articles the recommended threshold may reject",
+    )
+    parser.add_argument("--steps", type=int, default=20)
+    args = parser.parse_args()
+
+    decisions = load_decisions(args.logs)
+    if not decisions:
+        print(f"No Accepted/Rejected articles with content found in {args.logs}")
+        return
+    scores = np.array([score for score, _ in decisions])
+    accepted = np.array([is_accepted for _, is_accepted in decisions])
+    print(
+        f"{len(decisions)} articles: {int(accepted.sum())} accepted, {int((~accepted).sum())} rejected"
+    )
+    print(
+        f"median score accepted={np.median(scores[accepted]) if accepted.any() else 0:.3f} "
+        f"rejected={np.median(scores[~accepted]) if (~accepted).any() else 0:.3f}\n"
+    )
+
+    thresholds = np.unique(np.quantile(scores, np.linspace(0, 1, args.steps + 1)))
+    print(f"{'threshold':>10} {'prefiltered':>12} {'precision':>10} {'recall':>8} {'lost':>8}")
+    recommended = None
+    for threshold in thresholds:
+        result = evaluate(scores, accepted, float(threshold))
+        print(
+            f"{result['threshold']:>10.3f} {result['prefiltered']:>12} "
+            f"{result['precision']:>10.1%} {result['recall']:>8.1%} {result['lost']:>8.1%}"
+        )
+        if result["lost"] <= args.max_lost:
+            recommended = result
+
+    if recommended and recommended["prefiltered"]:
+        print(
+            f"\nRecommended: RELEVANCE_THRESHOLD={recommended['threshold']:.3f} "
+            f"(skips {recommended['recall']:.1%} of LLM rejections, loses {recommended['lost']:.1%} of accepted articles)"
+        )
+    else:
+        print(f"\nNo threshold loses at most {args.max_lost:.1%} of accepted articles; keep the prefilter off.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Compare the single-pass token budget against the old 10%-per-step truncation.
+
+Usage: python -m benchmarks.token_budget_benchmark [--sizes 200000,1000000,4000000]
+"""
+import argparse
+import random
+import time
+import tiktoken
+from services.token_budget_service import fit_to_budget
+
+MODEL = "gpt-4o-mini"
+MAX_INPUT_TOKENS = 195_000
+SYSTEM_PROMPT = "You are a professional tech analyst. " * 60
+WORDS = (
+    "model inference latency startup funding chip cloud open-source release developers "
+    "security vulnerability quantum robotics battery datacenter GPU compiler kernel "
+    "browser privacy regulation market revenue quarter platform benchmark dataset"
+).split()
+
+
+def legacy_truncate_to_fit(content):
+    """The previous llm_service.truncate_to_fit, kept here as the baseline."""
+    encoding = tiktoken.encoding_for_model(MODEL)
+    while True:
+        total_tokens = len(encoding.encode(SYSTEM_PROMPT)) + len(
+            encoding.encode("Article Content:\n" + content)
+        )
+        if total_tokens <= MAX_INPUT_TOKENS:
+            return content
+        content = content[: int(len(content) * 0.9)]
+
+
+def synthetic_article(size, seed):
+    rng = random.Random(seed)
+    paragraphs = []
+    length = 0
+    while length < size:
+        paragraph = " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 160))) + "."
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 1
+    return "\n".join(paragraphs)[:size]
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="200000,1000000,4000000")
+    args = parser.parse_args()
+
+    tiktoken.encoding_for_model(MODEL).encode("warm up")
+    print(f"{'chars':>10} {'legacy ms':>10} {'legacy kept':>12} {'new ms':>10} {'new kept':>10} {'tokens':>8} {'speedup':>8}")
+    for size in (int(value) for value in args.sizes.split(",")):
+        content = synthetic_article(size, seed=size)
+        legacy_time, legacy_content = timed(legacy_truncate_to_fit, content)
+        new_time, (new_content, tokens) = timed(
+            fit_to_budget, content, SYSTEM_PROMPT, MAX_INPUT_TOKENS, MODEL
+        )
+        assert tokens <= MAX_INPUT_TOKENS
+        print(
+            f"{size:>10} {legacy_time * 1000:>10.1f} {len(legacy_content):>12} "
+            f"{new_time * 1000:>10.1f} {len(new_content):>10} {tokens:>8} {legacy_time / new_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Compare FAISS index types on a synthetic corpus the size of a year of reports.
+
+The corpus is made of unit-length vectors clustered around random topics, like
+the embeddings of news chunks. Every index type is built (and trained where it
+needs it) with the same settings the vectorstore uses (FAISS_* variables),
+then queried one question at a time as /rag does. Recall@k is measured
+against exact search with the same metric.
+
+Usage:
+    python -m benchmarks.vector_index_benchmark [--chunks 100000] [--types flat,hnsw,ivf_pq] [--metric cosine]
+"""
+import argparse
+import time
+import faiss
+import numpy as np
+from services import vector_index_service
+
+# About 150 kept articles per weekly report, split into ~13 chunks each
+DEFAULT_CHUNKS = 52 * 150 * 13
+
+
+def synthetic_corpus(chunks, dimension, topics, queries, seed):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((topics, dimension), dtype=np.float32)
+    corpus = centers[rng.integers(0, topics, chunks)]
+    corpus += 0.6 * rng.standard_normal((chunks, dimension), dtype=np.float32)
+    faiss.normalize_L2(corpus)
+    # Questions land near existing chunks without matching any of them exactly
+    query_vectors = corpus[rng.integers(0, chunks, queries)].copy()
+    query_vectors += 0.04 * rng.standard_normal((queries, dimension), dtype=np.float32)
+    faiss.normalize_L2(query_vectors)
+    return corpus, query_vectors
+
+
+def ground_truth(corpus, query_vectors, k, metric):
+    index = vector_index_service.build_index(corpus.shape[1], "flat", metric)
+    index.add(corpus)
+    _, ids = index.search(query_vectors, k)
+    return ids
+
+
+def search_settings(index_type, dimension):
+    """The settings recall depends on, printed next to it."""
+    if index_type == "hnsw":
+        return f"efSearch={vector_index_service.FAISS_HNSW_EF_SEARCH}"
+    if index_type == "ivf_flat":
+        return f"nprobe={vector_index_service.FAISS_IVF_NPROBE}"
+    if index_type == "ivf_pq":
+        pq_m = vector_index_service.FAISS_PQ_M
+        return (
+            f"nprobe={vector_index_service.FAISS_IVF_NPROBE}, "
+            f"M={pq_m} ({dimension // pq_m} dims/byte)"
+        )
+    return ""
+
+
+def benchmark(index_type, metric, corpus, query_vectors, truth, k):
+    started = time.perf_counter()
+    index = vector_index_service.build_index(corpus.shape[1], index_type, metric, corpus)
+    trained = time.perf_counter()
+    index.add(corpus)
+    built = time.perf_counter()
+
+    latencies = []
+    recall_hits = 0
+    for query, expected in zip(query_vectors, truth):
+        query_started = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - query_started)
+        recall_hits += len(set(ids[0]) & set(expected))
+
+    latencies = np.array(latencies) * 1000
+    return {
+        "type": index_type,
+        "factory": vector_index_service.factory_string(index_type, len(corpus)),
+        "train_s": trained - started,
+        "add_s": built - trained,
+        "recall": recall_hits / (len(query_vectors) * k),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "memory_mb": vector_index_service.index_bytes(index) / 1024 / 1024,
+        "settings": search_settings(index_type, corpus.shape[1]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=DEFAULT_CHUNKS)
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--topics", type=int, default=400)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=5, help="top_k used by /rag")
+    parser.add_argument(
+        "--types", default=",".join(vector_index_service.INDEX_TYPES)
+    )
+    parser.add_argument("--metric", default=vector_index_service.FAISS_METRIC)
+    parser.add_argument("--threads", type=int, default=0, help="FAISS threads (0 = default)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    index_types = [index_type.strip() for index_type in args.types.split(",")]
+    if "ivf_pq" in index_types and args.dimension % vector_index_service.FAISS_PQ_M:
+        parser.error(
+            f"--dimension {args.dimension} is not a multiple of FAISS_PQ_M="
+            f"{vector_index_service.FAISS_PQ_M}; set FAISS_PQ_M to a divisor of it"
+        )
+
+    if args.threads:
+        faiss.omp_set_num_threads(args.threads)
+    print(
+        f"{args.chunks} chunks x {args.dimension} dims, {args.queries} queries, "
+        f"k={args.k}, metric={args.metric}"
+    )
+    corpus, query_vectors = synthetic_corpus(
+        args.chunks, args.dimension, args.topics, args.queries, args.seed
+    )
+    truth = ground_truth(corpus, query_vectors, args.k, args.metric)
+
+    print(
+        f"\n{'type':<9} {'factory':<16} {'train s':>8} {'add s':>7} "
+        f"{'recall@' + str(args.k):>9} {'p50 ms':>8} {'p99 ms':>8} {'memory MB':>10}  settings"
+    )
+    for index_type in index_types:
+        result = benchmark(index_type, args.metric, corpus, query_vectors, truth, args.k)
+        print(
+            f"{result['type']:<9} {result['factory']:<16} {result['train_s']:>8.2f} "
+            f"{result['add_s']:>7.2f} {result['recall']:>9.1%} {result['p50_ms']:>8.3f} "
+            f"{result['p99_ms']:>8.3f} {result['memory_mb']:>10.1f}  {result['settings']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
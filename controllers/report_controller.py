@@ -1,63 +1,310 @@
 import asyncio
+import datetime
+import os
 from services.google_api_service import fetch_google_api_top_stories
 from services.hackernews_service import fetch_hackernews_top_stories
-from services.llm_service import process_article
+from services.llm_service import (
+    process_article,
+    process_articles_batch,
+    prepare_result_cache,
+    build_error_result,
+)
 from services.csv_logger_service import write_report_to_csv
 from services import json_logger_service
 from models.report_model import ReportResponse, ReportItem
 from logger import logger
 from services.scraper_service import fetch_article_content
-from services import rag_service
+from services import rag_service, url_service, metrics_service
+from services.llm_dispatcher_service import LLM_MAX_CONCURRENCY
+from services.dedup_service import (
+    NearDuplicateIndex,
+    minhash_signature,
+    NEAR_DUP_SKIP_PREVIOUS,
+)
 
-CONCURRENCY_LIMIT = 3
+SCRAPE_WORKERS = int(os.getenv("SCRAPE_WORKERS", "8"))
+# LLM concurrency is governed by the shared dispatcher; workers only need to
+# keep enough requests queued for it to use every slot it opens up
+LLM_WORKERS = int(os.getenv("LLM_WORKERS", str(LLM_MAX_CONCURRENCY)))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "16"))
+# Articles the LLM flags for a retry are re-scraped with Selenium by these
+# workers, away from the LLM stage, and resubmitted after a backoff
+RESCRAPE_WORKERS = int(os.getenv("RESCRAPE_WORKERS", "2"))
+LLM_RETRY_BUDGET = int(os.getenv("LLM_RETRY_BUDGET", "1"))
+LLM_RETRY_BACKOFF = float(os.getenv("LLM_RETRY_BACKOFF", "2"))
+# "refresh" reprocesses URLs seen in earlier runs (cheap thanks to the caches),
+# "skip" leaves them out of the report
+SEEN_URL_POLICY = os.getenv("SEEN_URL_POLICY", "refresh")
 
 
-async def generate_tech_trends_report(logger):
-    hn_metadata = await fetch_hackernews_top_stories(logger)
-    google_metadata = await fetch_google_api_top_stories(logger)
+async def scrape_and_process(
+    logger,
+    articles,
+    run_id=None,
+    scrape_workers=SCRAPE_WORKERS,
+    llm_workers=LLM_WORKERS,
+    batch=False,
+):
+    """Scrape articles and hand each one to the LLM as soon as its content is ready.
+
+    Scrape and LLM workers are connected by bounded queues so slow sites never
+    leave the LLM stage idle. Near-duplicate content is sent to the LLM only once
+    and listed as an alternate source of the first copy. With batch=True the
+    scraped articles are collected and processed in one offline batch job
+    instead. Articles flagged for a retry go through a separate re-scrape queue
+    and back into the LLM queue. Results keep the order of the input articles.
+    """
+    scrape_queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    llm_queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    # Unbounded so LLM workers never wait on re-scrapes
+    retry_queue = asyncio.Queue()
+    results = [None] * len(articles)
+    dedup_index = NearDuplicateIndex()
+    dedup_index.load_history(logger)
+    representative_index = {}
+    alternate_sources = {}
+    previous_matches = {}
+    batch_items = []
+    requeue_tasks = set()
+    # Articles handed to the LLM stage that have no final result yet
+    outstanding = 0
+    all_submitted = False
+    drained = asyncio.Event()
+
+    async def feed():
+        for index, article in enumerate(articles):
+            await scrape_queue.put((index, article))
+        for _ in range(scrape_workers):
+            await scrape_queue.put(None)
+
+    async def scrape_worker():
+        nonlocal outstanding
+        while True:
+            item = await scrape_queue.get()
+            if item is None:
+                return
+            index, article = item
+            try:
+                method, content = await fetch_article_content(logger, article["url"])
+            except Exception as e:
+                logger.error(f"[Report] Scrape worker failed for {article['url']}: {e}")
+                continue
+            if not content:
+                continue
+            article["content"] = content
+            article["method"] = method
+
+            signature = await asyncio.to_thread(minhash_signature, content)
+            if signature is not None:
+                canonical_url = article.get("canonical_url", article["url"])
+                duplicate = dedup_index.find_duplicate(
+                    signature, exclude={article["url"], canonical_url}
+                )
+                if duplicate:
+                    duplicate_url, from_previous_run = duplicate
+                    if not from_previous_run:
+                        logger.info(
+                            f"[Dedup] {article['url']} is a near-duplicate of {duplicate_url}"
+                        )
+                        alternate_sources.setdefault(
+                            representative_index[duplicate_url], []
+                        ).append(article["url"])
+                        continue
+                    logger.info(
+                        f"[Dedup] {article['url']} matches {duplicate_url} from a previous run."
+                    )
+                    if NEAR_DUP_SKIP_PREVIOUS:
+                        continue
+                    previous_matches[index] = duplicate_url
+                dedup_index.add(canonical_url, signature)
+                representative_index[canonical_url] = index
+            outstanding += 1
+            await llm_queue.put((index, article, 0))
+
+    def record_result(index, article, result):
+        nonlocal outstanding
+        results[index] = result
+        if result["logging"]["status"] != "Error":
+            canonical_url = article.get("canonical_url", article["url"])
+            dedup_index.persist([canonical_url])
+            if run_id:
+                url_service.record_seen(
+                    [url_service.canonicalize_url(canonical_url)], run_id
+                )
+        outstanding -= 1
+        if all_submitted and outstanding == 0:
+            drained.set()
+
+    def handle_result(index, article, result, attempt):
+        if result["logging"]["retry"]:
+            retries_left = article.get("retries_left", LLM_RETRY_BUDGET)
+            if retries_left > 0:
+                logger.info(
+                    f"[LLM] Retry triggered for: {article['url']} (Remaining retries: {retries_left})"
+                )
+                # Kept as the final result if the re-scrape fails
+                results[index] = result
+                retry_queue.put_nowait((index, article, attempt))
+                return
+            logger.warning(f"[LLM] No retries left for: {article['url']}")
+        record_result(index, article, result)
+
+    async def llm_worker():
+        while True:
+            item = await llm_queue.get()
+            if item is None:
+                llm_queue.task_done()
+                return
+            index, article, attempt = item
+            if batch and attempt == 0:
+                batch_items.append((index, article))
+            else:
+                try:
+                    result = await process_article(article)
+                except Exception as e:
+                    logger.error(f"[Report] LLM worker failed for {article['url']}: {e}")
+                    result = build_error_result(article, str(e), article.get("content", ""))
+                handle_result(index, article, result, attempt)
+            llm_queue.task_done()
+
+    async def requeue(index, article, attempt):
+        await asyncio.sleep(LLM_RETRY_BACKOFF * 2**attempt)
+        await llm_queue.put((index, article, attempt + 1))
+
+    async def rescrape_worker():
+        while True:
+            item = await retry_queue.get()
+            if item is None:
+                return
+            index, article, attempt = item
+            try:
+                method, content = await fetch_article_content(
+                    logger, article["url"], method="Selenium"
+                )
+            except Exception as e:
+                logger.error(f"[Report] Re-scrape worker failed for {article['url']}: {e}")
+                content = None
+            if not content:
+                logger.error(f"[Scraper] Selenium failed for: {article['url']}")
+                record_result(index, article, results[index])
+                continue
+            article["content"] = content
+            article["method"] = "Selenium"
+            article["retries_left"] = article.get("retries_left", LLM_RETRY_BUDGET) - 1
+            task = asyncio.create_task(requeue(index, article, attempt))
+            requeue_tasks.add(task)
+            task.add_done_callback(requeue_tasks.discard)
+
+    if batch:
+        llm_workers = 1
+    worker_tasks = [asyncio.create_task(llm_worker()) for _ in range(llm_workers)]
+    worker_tasks += [asyncio.create_task(rescrape_worker()) for _ in range(RESCRAPE_WORKERS)]
+    try:
+        await asyncio.gather(
+            feed(), *(scrape_worker() for _ in range(scrape_workers))
+        )
+        if batch:
+            await llm_queue.join()
+            batch_results = await process_articles_batch(
+                [article for _, article in batch_items]
+            )
+            for (index, article), result in zip(batch_items, batch_results):
+                handle_result(index, article, result, 0)
+
+        all_submitted = True
+        if outstanding == 0:
+            drained.set()
+        await drained.wait()
+        for _ in range(llm_workers):
+            await llm_queue.put(None)
+        for _ in range(RESCRAPE_WORKERS):
+            retry_queue.put_nowait(None)
+        await asyncio.gather(*worker_tasks)
+    finally:
+        for task in worker_tasks + list(requeue_tasks):
+            task.cancel()
+
+    for index, urls in alternate_sources.items():
+        if results[index] is not None:
+            results[index]["metadata"]["alternate_sources"] = urls
+    for index, url in previous_matches.items():
+        if results[index] is not None:
+            results[index]["metadata"]["previously_seen_as"] = url
+    logger.info(
+        f"[Dedup] {sum(len(urls) for urls in alternate_sources.values())} near-duplicates merged into {len(alternate_sources)} articles."
+    )
+
+    return [result for result in results if result is not None]
+
+
+async def _run_report(logger, run_id, batch):
+    with metrics_service.timed("source_fetch", source="hackernews"):
+        hn_metadata = await fetch_hackernews_top_stories(logger)
+    with metrics_service.timed("source_fetch", source="google"):
+        google_metadata = await fetch_google_api_top_stories(logger)
     combined_metadata = hn_metadata + google_metadata
 
+    await url_service.canonicalize_articles(logger, combined_metadata)
     seen_urls = set()
     unique_articles = []
     for article in combined_metadata:
-        if article["url"] not in seen_urls:
-            seen_urls.add(article["url"])
+        if article["canonical_url"] not in seen_urls:
+            seen_urls.add(article["canonical_url"])
             unique_articles.append(article)
 
     logger.info(f"[Report] {len(unique_articles)} unique articles after deduplication.")
 
-    articles_with_content = []
-    for article in unique_articles:
-        method, content = await fetch_article_content(logger, article["url"])
-        if content:
-            article["content"] = content
-            article["method"] = method
-            articles_with_content.append(article)
-
-    semaphore = asyncio.Semaphore(CONCURRENCY_LIMIT)
-
-    async def limited_process(article):
-        async with semaphore:
-            return await process_article(article)
+    previous_runs = url_service.get_previous_runs(seen_urls, run_id)
+    logger.info(
+        f"[Report] {len(previous_runs)} articles were already processed in earlier runs (policy: {SEEN_URL_POLICY})."
+    )
+    if SEEN_URL_POLICY == "skip":
+        unique_articles = [
+            article
+            for article in unique_articles
+            if article["canonical_url"] not in previous_runs
+        ]
 
-    results = await asyncio.gather(
-        *(limited_process(article) for article in articles_with_content)
+    prepare_result_cache(logger)
+    results = await scrape_and_process(
+        logger, unique_articles, run_id=run_id, batch=batch
     )
 
-    await write_report_to_csv(results)
+    with metrics_service.timed("csv_write"):
+        await write_report_to_csv(results)
 
-    json_path = await json_logger_service.write_report_to_json(results)
+    with metrics_service.timed("json_write"):
+        json_path = await json_logger_service.write_report_to_json(results)
     logger.info(f"[Report] JSON report written to {json_path}")
 
-    rag_service.index_articles_from_json()
+    # Embedding and FAISS updates block, so keep them off the event loop
+    await asyncio.to_thread(rag_service.index_articles_from_json)
+    return results
 
-    total = len(results)
-    accepted = sum(1 for r in results if r["logging"]["status"] == "Accepted")
-    rejected = sum(1 for r in results if r["logging"]["status"] == "Rejected")
-    errors = sum(1 for r in results if r["logging"]["status"] == "Error")
-    logger.info(
-        f"[LLM] Summary: Total={total}, Accepted={accepted}, Rejected={rejected}, Errors={errors}"
-    )
+
+async def generate_tech_trends_report(logger, batch=False):
+    run_id = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    with metrics_service.track_run(run_id) as run:
+        results = await _run_report(logger, run_id, batch)
+
+        total = len(results)
+        accepted = sum(1 for r in results if r["logging"]["status"] == "Accepted")
+        rejected = sum(1 for r in results if r["logging"]["status"] == "Rejected")
+        errors = sum(1 for r in results if r["logging"]["status"] == "Error")
+        logger.info(
+            f"[LLM] Summary: Total={total}, Accepted={accepted}, Rejected={rejected}, Errors={errors}"
+        )
+        run.summary.update(
+            batch=batch,
+            articles={
+                "total": total,
+                "accepted": accepted,
+                "rejected": rejected,
+                "errors": errors,
+            },
+        )
+        for status, count in (("Accepted", accepted), ("Rejected", rejected), ("Error", errors)):
+            metrics_service.increment("articles_total", count, status=status)
 
     response = [
         ReportItem(
@@ -72,3 +319,4 @@ async def generate_tech_trends_report(logger):
     ]
 
     return ReportResponse(items=response)
+
@@ -4,8 +4,15 @@ from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from controllers import report_controller
 from logger import get_logger
-from services import rag_service, json_logger_service
-from fastapi.responses import StreamingResponse, JSONResponse
+from services import (
+    rag_service,
+    json_logger_service,
+    http_client_service,
+    browser_pool_service,
+    metrics_service,
+)
+from services.llm_batch_service import LLM_BATCH_MODE
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
 import json
 from apscheduler.schedulers.background import BackgroundScheduler
 import asyncio
@@ -18,12 +25,14 @@ logger.info("[Main] LLM-News API started")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    await http_client_service.start_http_client(logger=logger)
     logger.info("[Main] Initializing vectorstore.")
-    rag_service.initialize_vectorstore(logger=logger)
-    rag_service.index_articles_from_json(logger=logger)
+    rag_service.load_or_build_vectorstore(logger=logger)
     logger.info("[Main] Vectorstore ready.")
     yield
     logger.info("[Main] Shutting down application.")
+    await http_client_service.close_http_client(logger=logger)
+    await asyncio.to_thread(browser_pool_service.shutdown_browser_pool, logger)
 
 
 app = FastAPI(lifespan=lifespan)
@@ -36,7 +45,9 @@ class RAGQuery(BaseModel):
 @app.get("/report")
 async def get_report():
     logger.info("[Main] Received report request")
-    report = await report_controller.generate_tech_trends_report(logger)
+    report = await report_controller.generate_tech_trends_report(
+        logger, batch=LLM_BATCH_MODE == "always"
+    )
     return JSONResponse(content=report.model_dump())
 
 
@@ -44,10 +55,10 @@ async def get_report():
 async def query_rag(request: RAGQuery):
     logger.info(f"[Main] Received RAG query: {request.question}")
 
-    def token_stream():
-        yield from rag_service.stream_query_articles(request.question, logger=logger)
-
-    return StreamingResponse(token_stream(), media_type="text/plain")
+    return StreamingResponse(
+        rag_service.stream_query_articles(request.question, logger=logger),
+        media_type="text/plain",
+    )
 
 
 @app.get("/categories")
@@ -92,12 +103,32 @@ async def get_latest_report():
     return JSONResponse(content={"items": accepted_articles})
 
 
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(
+        metrics_service.render_prometheus(), media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.get("/runs")
+async def get_runs(limit: int = 20):
+    return JSONResponse(content={"runs": metrics_service.get_run_summaries(limit)})
+
+
 async def run_report_and_index():
     logger.info("[Scheduler] Running scheduled report and index job.")
-    report = await report_controller.generate_tech_trends_report(logger)
+    report = await report_controller.generate_tech_trends_report(
+        logger, batch=LLM_BATCH_MODE in ("scheduled", "always")
+    )
     logger.info("[Scheduler] Report and index job complete.")
 
 
+async def run_scheduled_report_and_index():
+    # Scheduled jobs run in their own event loop, so they need their own client
+    async with http_client_service.http_client_session(logger=logger):
+        await run_report_and_index()
+
+
 # On app startup, run the report and schedule weekly job
 scheduler = BackgroundScheduler()
 
@@ -109,7 +140,7 @@ def start_scheduler():
 
     # Schedule weekly job (every Monday at 00:00)
     scheduler.add_job(
-        lambda: asyncio.run(run_report_and_index()),
+        lambda: asyncio.run(run_scheduled_report_and_index()),
         "cron",
         day_of_week="mon",
         hour=0,
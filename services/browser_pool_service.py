@@ -0,0 +1,237 @@
+import os
+import platform
+import re
+import shutil
+import subprocess
+import threading
+import undetected_chromedriver as uc
+from selenium.common.exceptions import (
+    InvalidSessionIdException,
+    NoSuchWindowException,
+    TimeoutException,
+)
+from selenium.webdriver.common.by import By
+
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+BROWSER_MAX_PAGES = int(os.getenv("BROWSER_MAX_PAGES", "50"))
+BROWSER_PAGE_LOAD_TIMEOUT = int(os.getenv("BROWSER_PAGE_LOAD_TIMEOUT", "20"))
+DEFAULT_CHROME_VERSION = "137.0.7151.120"
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36"
+
+_VERSION_PATTERN = re.compile(r"(\d+\.\d+\.\d+\.\d+)")
+
+
+def _windows_chrome_paths():
+    return [
+        os.path.join(os.environ.get("PROGRAMFILES", ""), "Google\\Chrome\\Application\\chrome.exe"),
+        os.path.join(os.environ.get("PROGRAMFILES(X86)", ""), "Google\\Chrome\\Application\\chrome.exe"),
+        os.path.join(os.environ.get("LOCALAPPDATA", ""), "Google\\Chrome\\Application\\chrome.exe"),
+    ]
+
+
+def _get_chrome_version_win(logger):
+    try:
+        import win32api
+    except ImportError:
+        logger.warning("[Selenium] pywin32 not installed, cannot read Chrome version.")
+        return None
+
+    for path in _windows_chrome_paths():
+        if os.path.exists(path):
+            try:
+                info = win32api.GetFileVersionInfo(path, "\\")
+                ms = info["FileVersionMS"]
+                ls = info["FileVersionLS"]
+                return f"{ms >> 16}.{ms & 0xFFFF}.{ls >> 16}.{ls & 0xFFFF}"
+            except Exception as e:
+                logger.warning(f"[Selenium] Failed to read version from {path}: {e}")
+    return None
+
+
+def _get_chrome_version_from_binary(logger):
+    candidates = [
+        "google-chrome",
+        "google-chrome-stable",
+        "chromium",
+        "chromium-browser",
+        "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+    ]
+    for candidate in candidates:
+        binary = shutil.which(candidate) or (candidate if os.path.exists(candidate) else None)
+        if not binary:
+            continue
+        try:
+            output = subprocess.run(
+                [binary, "--version"], capture_output=True, text=True, timeout=10
+            ).stdout
+        except Exception as e:
+            logger.warning(f"[Selenium] Failed to run {binary} --version: {e}")
+            continue
+        match = _VERSION_PATTERN.search(output)
+        if match:
+            return match.group(1)
+    return None
+
+
+def detect_chrome_version(logger, default_version=DEFAULT_CHROME_VERSION):
+    if platform.system() == "Windows":
+        version = _get_chrome_version_win(logger)
+    else:
+        version = _get_chrome_version_from_binary(logger)
+
+    if not version:
+        logger.warning("[Selenium] Could not detect Chrome version. Using default.")
+        return default_version
+    return version
+
+
+def _build_options():
+    options = uc.ChromeOptions()
+    if platform.system() == "Linux":
+        options.add_argument("--headless=new")
+        options.add_argument("--no-sandbox")
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument("--disable-gpu")
+
+    options.add_argument("--disable-blink-features=AutomationControlled")
+    options.add_argument("--disable-extensions")
+    options.add_argument("--disable-infobars")
+    options.add_argument(f"user-agent={USER_AGENT}")
+    return options
+
+
+class _PooledBrowser:
+    def __init__(self, driver):
+        self.driver = driver
+        self.base_handle = driver.current_window_handle
+        self.pages = 0
+
+
+class BrowserPool:
+    """Bounded pool of long-lived Chrome instances; each page gets its own tab."""
+
+    def __init__(self, logger, size=BROWSER_POOL_SIZE, max_pages=BROWSER_MAX_PAGES):
+        self.logger = logger
+        self.size = size
+        self.max_pages = max_pages
+        self.major_version = int(detect_chrome_version(logger).split(".")[0])
+        self._idle = []
+        self._total = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def _launch(self):
+        driver = uc.Chrome(version_main=self.major_version, options=_build_options())
+        driver.set_page_load_timeout(BROWSER_PAGE_LOAD_TIMEOUT)
+        self.logger.info("[Selenium] Launched pooled browser.")
+        return _PooledBrowser(driver)
+
+    def _acquire(self):
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Browser pool is closed")
+                if self._idle:
+                    return self._idle.pop()
+                if self._total < self.size:
+                    self._total += 1
+                    break
+                self._condition.wait()
+
+        try:
+            return self._launch()
+        except Exception:
+            with self._condition:
+                self._total -= 1
+                self._condition.notify()
+            raise
+
+    def _release(self, browser, healthy):
+        recycle = not healthy or browser.pages >= self.max_pages
+        with self._condition:
+            if recycle or self._closed:
+                self._total -= 1
+            else:
+                self._idle.append(browser)
+            self._condition.notify()
+        if recycle or self._closed:
+            self._quit(browser)
+
+    def _quit(self, browser):
+        try:
+            browser.driver.quit()
+        except Exception as e:
+            self.logger.warning(f"[Selenium] Exception while quitting driver: {e}")
+
+    def _is_alive(self, browser):
+        """Whether the driver session still answers, back on its base tab."""
+        try:
+            browser.driver.switch_to.window(browser.base_handle)
+            browser.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def fetch_paragraphs(self, url):
+        browser = self._acquire()
+        healthy = True
+        try:
+            driver = browser.driver
+            driver.switch_to.new_window("tab")
+            browser.pages += 1
+            try:
+                self.logger.info(f"[Selenium] Navigating to: {url}")
+                try:
+                    driver.get(url)
+                except TimeoutException:
+                    self.logger.warning(f"[Selenium] Page load timed out for {url}")
+                    driver.execute_script("window.stop();")
+                driver.implicitly_wait(2)
+                paragraphs = driver.find_elements(By.TAG_NAME, "p")
+                return "\n".join([p.text for p in paragraphs if p.text.strip()])
+            finally:
+                driver.close()
+                driver.switch_to.window(browser.base_handle)
+        except (InvalidSessionIdException, NoSuchWindowException):
+            healthy = False
+            raise
+        except Exception:
+            # DNS failures, timeouts and stale elements surface as plain
+            # WebDriverException, a crashed chromedriver as urllib3 or socket
+            # errors; only recycle Chrome if the session is gone
+            healthy = self._is_alive(browser)
+            raise
+        finally:
+            self._release(browser, healthy)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+            self._condition.notify_all()
+        for browser in idle:
+            self._quit(browser)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool(logger):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool(logger)
+        return _pool
+
+
+def shutdown_browser_pool(logger=None):
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+        if logger:
+            logger.info("[Selenium] Browser pool shut down.")
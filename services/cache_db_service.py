@@ -0,0 +1,52 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+CACHE_DIR = Path(
+    os.getenv("CACHE_DIR", Path(__file__).resolve().parent.parent / "cache")
+)
+
+_connections = {}
+_lock = threading.RLock()
+
+
+def _connect(name, schema):
+    conn = _connections.get(name)
+    if conn is None:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(
+            CACHE_DIR / f"{name}.sqlite3", check_same_thread=False, isolation_level=None
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(schema)
+        _connections[name] = conn
+    return conn
+
+
+@contextmanager
+def cache_db(name, schema):
+    """Yield the shared sqlite connection for a cache, creating it on first use.
+
+    Connections are shared between the event loop and worker threads, so all
+    access is serialized through a single lock.
+    """
+    with _lock:
+        conn = _connect(name, schema)
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+
+def close_all():
+    with _lock:
+        for conn in _connections.values():
+            conn.close()
+        _connections.clear()
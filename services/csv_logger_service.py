@@ -4,8 +4,8 @@ import string
 import locale
 import datetime
 import re
-from pathlib import Path
 from logger import logger
+from services.json_logger_service import REPORTS_DIR
 
 
 def clean_for_csv(text, delimiter):
@@ -25,7 +25,7 @@ def escape_csv_field(text):
 
 
 async def write_report_to_csv(all_articles):
-    logs_dir = Path(__file__).resolve().parent.parent / "logs"
+    logs_dir = REPORTS_DIR
     logs_dir.mkdir(parents=True, exist_ok=True)
     filename = f"{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_{''.join(random.choices(string.ascii_uppercase + string.digits, k=6))}.csv"
     filepath = logs_dir / filename
@@ -0,0 +1,126 @@
+import os
+import re
+import time
+import zlib
+import numpy as np
+from services.cache_db_service import cache_db
+
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.8"))
+NEAR_DUP_HISTORY_DAYS = int(os.getenv("NEAR_DUP_HISTORY_DAYS", "28"))
+NEAR_DUP_SKIP_PREVIOUS = os.getenv("NEAR_DUP_SKIP_PREVIOUS", "false").lower() == "true"
+SHINGLE_SIZE = 5
+MIN_WORDS = 50
+NUM_PERMUTATIONS = 128
+# 16 bands of 8 rows: pairs above ~0.7 Jaccard very likely share a band
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+# Shingles hashed at once; 4096 x 128 uint64 is 4 MB per worker
+MINHASH_BLOCK = 4096
+
+_PRIME = np.uint64(4294967311)  # smallest prime above 2**32
+_rng = np.random.default_rng(20240601)
+_PERM_A = _rng.integers(1, 2**32, NUM_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 2**32, NUM_PERMUTATIONS, dtype=np.uint64)
+_WORD = re.compile(r"\w+")
+
+_SCHEMA = """
+-- url is the canonical URL of the article
+CREATE TABLE IF NOT EXISTS near_dup_signatures (
+    url TEXT PRIMARY KEY,
+    signature BLOB NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+def minhash_signature(content):
+    """MinHash signature over word shingles, or None for content too short to compare."""
+    words = _WORD.findall(content.lower())
+    if len(words) < MIN_WORDS:
+        return None
+    shingles = {
+        zlib.crc32(" ".join(words[i : i + SHINGLE_SIZE]).encode("utf-8"))
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+    hashes = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+    # Blocks bound the shingles x permutations matrix on very long pages
+    signature = np.full(NUM_PERMUTATIONS, np.iinfo(np.uint64).max, dtype=np.uint64)
+    for start in range(0, len(hashes), MINHASH_BLOCK):
+        block = hashes[start : start + MINHASH_BLOCK]
+        # a * x + b stays below 2**64 because a, b and x are all below 2**32
+        permuted = (np.outer(block, _PERM_A) + _PERM_B) % _PRIME
+        np.minimum(signature, permuted.min(axis=0), out=signature)
+    return signature
+
+
+def estimated_similarity(first, second):
+    return float(np.mean(first == second))
+
+
+class NearDuplicateIndex:
+    """MinHash LSH index over this run's articles plus recently processed ones."""
+
+    def __init__(self, threshold=NEAR_DUP_THRESHOLD):
+        self.threshold = threshold
+        self.signatures = {}
+        self.previous_urls = set()
+        self.buckets = {}
+
+    def _band_keys(self, signature):
+        return [
+            (band, signature[band * LSH_ROWS : (band + 1) * LSH_ROWS].tobytes())
+            for band in range(LSH_BANDS)
+        ]
+
+    def _insert(self, url, signature):
+        self.signatures[url] = signature
+        for key in self._band_keys(signature):
+            self.buckets.setdefault(key, []).append(url)
+
+    def load_history(self, logger=None):
+        cutoff = time.time() - NEAR_DUP_HISTORY_DAYS * 24 * 3600
+        with cache_db("near_dup", _SCHEMA) as db:
+            db.execute("DELETE FROM near_dup_signatures WHERE created_at < ?", (cutoff,))
+            rows = db.execute("SELECT url, signature FROM near_dup_signatures").fetchall()
+        for row in rows:
+            self._insert(row["url"], np.frombuffer(row["signature"], dtype=np.uint64))
+            self.previous_urls.add(row["url"])
+        if logger:
+            logger.info(f"[Dedup] Loaded {len(rows)} signatures from previous runs.")
+
+    def find_duplicate(self, signature, exclude=()):
+        """Return (url, from_previous_run) of the closest match above the threshold.
+
+        URLs in `exclude` (the article's own URL and canonical URL) are never
+        matched, so an article seen in an earlier run does not match itself.
+        """
+        best_url, best_score = None, self.threshold
+        candidates = {
+            url
+            for key in self._band_keys(signature)
+            for url in self.buckets.get(key, [])
+            if url not in exclude
+        }
+        for url in candidates:
+            score = estimated_similarity(signature, self.signatures[url])
+            if score >= best_score:
+                best_url, best_score = url, score
+        if best_url is None:
+            return None
+        return best_url, best_url in self.previous_urls
+
+    def add(self, url, signature):
+        self.previous_urls.discard(url)
+        self._insert(url, signature)
+
+    def persist(self, urls):
+        now = time.time()
+        with cache_db("near_dup", _SCHEMA) as db:
+            db.executemany(
+                "INSERT OR REPLACE INTO near_dup_signatures (url, signature, created_at) VALUES (?, ?, ?)",
+                [
+                    (url, self.signatures[url].tobytes(), now)
+                    for url in urls
+                    if url in self.signatures
+                ],
+            )
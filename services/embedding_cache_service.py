@@ -0,0 +1,68 @@
+import hashlib
+import os
+import time
+import numpy as np
+from services.cache_db_service import cache_db
+
+# Entries are refreshed whenever they are used, so only chunks that have left
+# the index for this long are dropped
+EMBEDDING_CACHE_TTL = int(os.getenv("EMBEDDING_CACHE_TTL", str(90 * 24 * 3600)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    chunk_id TEXT NOT NULL,
+    model TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    used_at REAL NOT NULL,
+    PRIMARY KEY (chunk_id, model)
+);
+CREATE INDEX IF NOT EXISTS embeddings_used_at ON embeddings (used_at);
+"""
+
+
+def chunk_id(source, text):
+    """Stable id of a chunk, used both as docstore id and embedding cache key."""
+    return hashlib.sha256(f"{source}\x00{text}".encode("utf-8")).hexdigest()
+
+
+def get_embeddings(chunk_ids, model):
+    """Return a dict of chunk id -> float32 vector for the cached chunks."""
+    found = {}
+    now = time.time()
+    with cache_db("embeddings", _SCHEMA) as db:
+        for chunk in chunk_ids:
+            row = db.execute(
+                "SELECT vector FROM embeddings WHERE chunk_id = ? AND model = ?",
+                (chunk, model),
+            ).fetchone()
+            if row is None:
+                continue
+            found[chunk] = np.frombuffer(row["vector"], dtype=np.float32)
+            db.execute(
+                "UPDATE embeddings SET used_at = ? WHERE chunk_id = ? AND model = ?",
+                (now, chunk, model),
+            )
+    return found
+
+
+def store_embeddings(vectors, model):
+    """Store a dict of chunk id -> vector."""
+    now = time.time()
+    with cache_db("embeddings", _SCHEMA) as db:
+        db.executemany(
+            "INSERT OR REPLACE INTO embeddings (chunk_id, model, vector, used_at) "
+            "VALUES (?, ?, ?, ?)",
+            [
+                (chunk, model, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                for chunk, vector in vectors.items()
+            ],
+        )
+
+
+def evict(logger=None):
+    with cache_db("embeddings", _SCHEMA) as db:
+        expired = db.execute(
+            "DELETE FROM embeddings WHERE used_at < ?", (time.time() - EMBEDDING_CACHE_TTL,)
+        ).rowcount
+    if logger and expired:
+        logger.info(f"[Embedding Cache] Evicted {expired} expired embeddings.")
@@ -1,18 +1,66 @@
 import os
 import json
-import requests
-import math
 import asyncio
+import datetime
+from zoneinfo import ZoneInfo
 from dotenv import load_dotenv
-from services.llm_service import validate_article_url
+from services import http_client_service, metrics_service
+from services.cache_db_service import cache_db
+from services.rate_limiter_service import TokenBucket
+from services.url_classifier_service import classify_urls
+from services.url_service import canonicalize_url
 
 load_dotenv()
 
 GOOGLE_API_URL = "https://www.googleapis.com/customsearch/v1"
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 GOOGLE_ENV_KEYS = json.loads(os.getenv("GOOGLE_ENV_KEYS", "[]"))
+GOOGLE_DAILY_QUOTA = int(os.getenv("GOOGLE_DAILY_QUOTA", "100"))
+GOOGLE_QUERIES_PER_SECOND = float(os.getenv("GOOGLE_QUERIES_PER_SECOND", "2"))
+GOOGLE_MAX_ARTICLES = 20
 
-def fetch_news_page(logger, cx, start_index=1, search_query=None):
+_QUOTA_SCHEMA = """
+CREATE TABLE IF NOT EXISTS google_quota (
+    day TEXT PRIMARY KEY,
+    used INTEGER NOT NULL
+);
+"""
+
+_buckets = {}
+
+
+def _get_bucket():
+    # asyncio primitives belong to one event loop, see http_client_service
+    loop = asyncio.get_running_loop()
+    for stale_loop in [l for l in _buckets if l.is_closed()]:
+        del _buckets[stale_loop]
+    if loop not in _buckets:
+        _buckets[loop] = TokenBucket(GOOGLE_QUERIES_PER_SECOND)
+    return _buckets[loop]
+
+
+# Google resets the daily quota at midnight Pacific time, daylight saving included
+_QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+
+
+def _reserve_daily_quota():
+    """Count one query against today's quota (Pacific time, like Google does)."""
+    day = datetime.datetime.now(_QUOTA_TIMEZONE).date()
+    with cache_db("google_quota", _QUOTA_SCHEMA) as db:
+        row = db.execute(
+            "SELECT used FROM google_quota WHERE day = ?", (day.isoformat(),)
+        ).fetchone()
+        used = row["used"] if row else 0
+        if used >= GOOGLE_DAILY_QUOTA:
+            return False
+        db.execute(
+            "INSERT OR REPLACE INTO google_quota (day, used) VALUES (?, ?)",
+            (day.isoformat(), used + 1),
+        )
+    return True
+
+
+async def fetch_news_page(logger, cx, start_index=1, search_query=None):
     if search_query is None:
         # Use more specific queries that are likely to return articles
         search_queries = [
@@ -38,7 +86,13 @@ def fetch_news_page(logger, cx, start_index=1, search_query=None):
             '"renewable energy" "technology" "announces"'
         ]
         search_query = search_queries[start_index % len(search_queries)]
-    
+
+    if not _reserve_daily_quota():
+        logger.warning(
+            f"[Google API] Daily quota of {GOOGLE_DAILY_QUOTA} queries used, skipping query: {search_query}"
+        )
+        return {}
+
     params = {
         "key": GOOGLE_API_KEY,
         "cx": cx,
@@ -48,7 +102,12 @@ def fetch_news_page(logger, cx, start_index=1, search_query=None):
         "start": start_index,
         "num": 10,
     }
-    response = requests.get(GOOGLE_API_URL, params=params)
+    await _get_bucket().acquire()
+    try:
+        response = await http_client_service.get(GOOGLE_API_URL, logger=logger, params=params)
+    except Exception as e:
+        logger.error(f"[Google API] Request failed for query {search_query}: {e}")
+        return {}
     logger.info(
         f"[Google API] Response from Google: {response.status_code}, using query: {search_query}"
     )
@@ -77,10 +136,15 @@ async def fetch_google_api_top_stories(logger):
             '"cybersecurity" "announces" "news"',
             '"cloud computing" "announces" "update"'
         ]
-        
-        for query in search_queries:
-            initial_response = fetch_news_page(logger, cx, 1, query)
 
+        # Queries for one engine run concurrently; engines run in waves so the
+        # article limit below still saves quota on the remaining engines.
+        responses = await asyncio.gather(
+            *(fetch_news_page(logger, cx, 1, query) for query in search_queries)
+        )
+
+        candidates = []
+        for query, initial_response in zip(search_queries, responses):
             if not initial_response or "searchInformation" not in initial_response:
                 logger.warning(f"[Google API] No results using engine id ({cx}) with query: {query}")
                 continue
@@ -92,34 +156,31 @@ async def fetch_google_api_top_stories(logger):
                 f"[Google API] {total_results} results found using engine id ({cx}) with query: {query}"
             )
 
-            items = initial_response.get("items", [])
-            for item in items:
+            for item in initial_response.get("items", []):
                 url = item["link"]
-                title = item["title"]
-                
-                # Skip if we've already seen this URL
-                if url in seen_urls:
+                # Skip if we've already seen this URL (or a tracking/AMP variant of it)
+                canonical_url = canonicalize_url(url)
+                if canonical_url in seen_urls:
                     continue
-                
-                # Use LLM to validate if this is an actual article
-                is_article, reason = await validate_article_url(url, title)
-                
-                if is_article:
-                    metadata.append({
-                        "title": title,
-                        "url": url,
-                        "source": "Google"
-                    })
-                    seen_urls.add(url)
-                    logger.info(f"[Google API] Added article: {title}")
-                else:
-                    logger.info(f"[Google API] Filtered out non-article: {title} - {url} (Reason: {reason})")
-
-            # Limit to first page per query to avoid rate limits
-            if len(metadata) >= 20:  # Limit total articles
-                break
-        
-        if len(metadata) >= 20:  # Limit total articles
+                seen_urls.add(canonical_url)
+                candidates.append((url, item["title"]))
+
+        # Classify whether these are actual articles (cache, URL prefilter, batched LLM)
+        with metrics_service.timed("url_validation"):
+            verdicts = await classify_urls(logger, candidates)
+        for (url, title), (is_article, reason) in zip(candidates, verdicts):
+            if is_article:
+                metadata.append({
+                    "title": title,
+                    "url": url,
+                    "canonical_url": canonicalize_url(url),
+                    "source": "Google"
+                })
+                logger.info(f"[Google API] Added article: {title}")
+            else:
+                logger.info(f"[Google API] Filtered out non-article: {title} - {url} (Reason: {reason})")
+
+        if len(metadata) >= GOOGLE_MAX_ARTICLES:  # Limit total articles
             break
 
     logger.info(f"[Google API] Fetched metadata for {len(metadata)} articles after LLM validation.")
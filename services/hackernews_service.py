@@ -1,46 +1,151 @@
 import asyncio
-import httpx
+import os
+import time
+from services import http_client_service
+from services.cache_db_service import cache_db
+from services.url_service import canonicalize_url
 
-HACKERNEWS_API_URL = "https://hacker-news.firebaseio.com/v0/topstories.json"
+HACKERNEWS_LIST_URL = "https://hacker-news.firebaseio.com/v0/{}.json"
 HACKERNEWS_ITEM_URL = "https://hacker-news.firebaseio.com/v0/item/{}.json"
+HACKERNEWS_STORY_LISTS = {"top": "topstories", "best": "beststories", "new": "newstories"}
 
+HN_STORY_LIMIT = int(os.getenv("HN_STORY_LIMIT", "25"))
+HN_STORY_LISTS = [name.strip() for name in os.getenv("HN_STORY_LISTS", "top").split(",")]
+HN_FETCH_CONCURRENCY = int(os.getenv("HN_FETCH_CONCURRENCY", "16"))
+HN_ITEM_TIMEOUT = float(os.getenv("HN_ITEM_TIMEOUT", "5"))
+HN_ITEM_RETRIES = int(os.getenv("HN_ITEM_RETRIES", "2"))
+# Stories without a URL (Ask HN, deleted items) may still change, so recheck them
+HN_NO_URL_TTL = int(os.getenv("HN_NO_URL_TTL", str(6 * 3600)))
 
-async def fetch_hackernews_top_stories(logger, limit=25):
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(HACKERNEWS_API_URL, timeout=10)
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hn_items (
+    id INTEGER PRIMARY KEY,
+    title TEXT,
+    url TEXT,
+    fetched_at REAL NOT NULL
+);
+"""
+
+
+def _load_cached_items(story_ids):
+    cutoff = time.time() - HN_NO_URL_TTL
+    rows = []
+    with cache_db("hn_items", _SCHEMA) as db:
+        # Stay well below sqlite's bound-parameter limit
+        for start in range(0, len(story_ids), 500):
+            batch = story_ids[start : start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows += db.execute(
+                f"SELECT id, title, url, fetched_at FROM hn_items WHERE id IN ({placeholders})",
+                batch,
+            ).fetchall()
+    return {
+        row["id"]: dict(row)
+        for row in rows
+        if row["url"] is not None or row["fetched_at"] >= cutoff
+    }
+
+
+def _store_items(items):
+    now = time.time()
+    with cache_db("hn_items", _SCHEMA) as db:
+        db.executemany(
+            "INSERT OR REPLACE INTO hn_items (id, title, url, fetched_at) VALUES (?, ?, ?, ?)",
+            [(item["id"], item["title"], item["url"], now) for item in items],
+        )
+
+
+async def _fetch_story_ids(logger, list_name):
+    response = await http_client_service.get(
+        HACKERNEWS_LIST_URL.format(HACKERNEWS_STORY_LISTS[list_name]),
+        logger=logger,
+        timeout=10,
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+async def _fetch_item(logger, semaphore, story_id):
+    for attempt in range(HN_ITEM_RETRIES + 1):
+        try:
+            async with semaphore:
+                response = await http_client_service.get(
+                    HACKERNEWS_ITEM_URL.format(story_id),
+                    logger=logger,
+                    timeout=HN_ITEM_TIMEOUT,
+                )
             response.raise_for_status()
+            json_data = response.json() or {}
+            return {
+                "id": story_id,
+                "title": json_data.get("title", "No Title"),
+                "url": json_data.get("url"),
+            }
+        except Exception as e:
+            if attempt == HN_ITEM_RETRIES:
+                logger.error(f"[Hacker News API] Exception for item {story_id}: {e}")
+                return None
+            await asyncio.sleep(0.5 * 2**attempt)
+
+
+async def fetch_hackernews_top_stories(logger, limit=HN_STORY_LIMIT, story_lists=None):
+    story_lists = story_lists or HN_STORY_LISTS
+    try:
+        story_ids = []
+        seen_ids = set()
+        for list_name in story_lists:
+            if list_name not in HACKERNEWS_STORY_LISTS:
+                logger.warning(f"[Hacker News API] Unknown story list: {list_name}")
+                continue
+            try:
+                list_ids = await _fetch_story_ids(logger, list_name)
+            except Exception as e:
+                # Keep the stories of the lists that did load
+                logger.error(f"[Hacker News API] Failed to fetch {list_name} stories: {e}")
+                continue
+            for story_id in list_ids[:limit]:
+                if story_id not in seen_ids:
+                    seen_ids.add(story_id)
+                    story_ids.append(story_id)
+        logger.info(f"[Hacker News API] Total results found: {len(story_ids)}")
 
-            top_story_ids = response.json()[:limit]
-            logger.info(f"[Hacker News API] Total results found: {len(top_story_ids)}")
-
-            tasks = [
-                client.get(HACKERNEWS_ITEM_URL.format(story_id))
-                for story_id in top_story_ids
-            ]
-            responses = await asyncio.gather(*tasks, return_exceptions=True)
-
-            metadata = []
-
-            for resp in responses:
-                if isinstance(resp, Exception):
-                    logger.error(f"[Hacker News API] Exception: {resp}")
-                    continue
-
-                json_data = resp.json()
-                if "url" in json_data:
-                    metadata.append(
-                        {
-                            "title": json_data.get("title", "No Title"),
-                            "url": json_data["url"],
-                            "source": "HackerNews",
-                        }
-                    )
-
-            logger.info(
-                f"[Hacker News API] Fetched metadata for {len(metadata)} articles."
+        cached = _load_cached_items(story_ids)
+        missing_ids = [story_id for story_id in story_ids if story_id not in cached]
+        logger.info(
+            f"[Hacker News API] {len(cached)} items cached, fetching {len(missing_ids)} new items."
+        )
+
+        semaphore = asyncio.Semaphore(HN_FETCH_CONCURRENCY)
+        fetched = await asyncio.gather(
+            *(_fetch_item(logger, semaphore, story_id) for story_id in missing_ids)
+        )
+        fetched = [item for item in fetched if item is not None]
+        _store_items(fetched)
+
+        items = {**cached, **{item["id"]: item for item in fetched}}
+        metadata = []
+        seen_urls = set()
+        for story_id in story_ids:
+            item = items.get(story_id)
+            if not item or not item["url"]:
+                continue
+            canonical_url = canonicalize_url(item["url"])
+            if canonical_url in seen_urls:
+                continue
+            seen_urls.add(canonical_url)
+            metadata.append(
+                {
+                    "title": item["title"] or "No Title",
+                    "url": item["url"],
+                    "canonical_url": canonical_url,
+                    "source": "HackerNews",
+                }
             )
-            return metadata
+
+        logger.info(
+            f"[Hacker News API] Fetched metadata for {len(metadata)} articles."
+        )
+        return metadata
 
     except Exception as e:
         logger.error(f"[Hacker News API] Failed: {e}")
@@ -0,0 +1,183 @@
+import asyncio
+import os
+import re
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import etree
+
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+HTML_EXTRACTOR = os.getenv("HTML_EXTRACTOR", "lxml" if LXML_AVAILABLE else "beautifulsoup")
+# Pages above this size are parsed in a worker thread to keep the event loop free
+OFFLOAD_THRESHOLD = int(os.getenv("HTML_OFFLOAD_THRESHOLD", str(256 * 1024)))
+FEED_CHUNK_SIZE = 64 * 1024
+
+# BeautifulSoup's get_text() leaves these out, so the lxml backend does too
+_SKIP_TAGS = {"script", "style", "template"}
+# BeautifulSoup collapses strings of only these to one space or newline,
+# except inside these tags
+_ASCII_SPACES = " \n\t\x0c\r"
+_PRESERVE_WHITESPACE_TAGS = {"pre", "textarea"}
+# Start tags that make lxml close an open <p> where html.parser nests them
+_CLOSES_P = {
+    "address", "blockquote", "caption", "center", "col", "colgroup", "dd", "dir",
+    "div", "dl", "dt", "fieldset", "form", "frameset", "h1", "h2", "h3", "h4",
+    "h5", "h6", "head", "hr", "li", "listing", "menu", "ol", "p", "pre", "table",
+    "tbody", "td", "tfoot", "th", "title", "tr", "ul", "xmp",
+}
+_P_TAG = re.compile(r"<(/?)p\b", re.IGNORECASE)
+_TAG = re.compile(r"<(/?)([a-z][a-z0-9]*)", re.IGNORECASE)
+
+
+def extract_with_beautifulsoup(html):
+    soup = BeautifulSoup(html, "html.parser")
+    paragraphs = (p.get_text() for p in soup.find_all("p"))
+    return "\n".join(text for text in paragraphs if text.strip())
+
+
+def _paragraph_is_clean(html, start, end):
+    """Whether lxml keeps everything between a <p> and its </p> in the paragraph."""
+    opened = {}
+    for match in _TAG.finditer(html, start, end):
+        name = match.group(2).lower()
+        if not match.group(1):
+            if name in _CLOSES_P:
+                return False
+            opened[name] = opened.get(name, 0) + 1
+        elif opened.get(name):
+            opened[name] -= 1
+        else:
+            # Closing an element the paragraph is inside of closes it too
+            return False
+    return True
+
+
+def _clean_paragraph_count(html):
+    """Number of <p> tags when every one is closed by its own </p> with
+    nothing in between that lxml and html.parser would nest differently,
+    otherwise None.
+
+    Tags inside comments and scripts are counted as well, which can only
+    send a page to the fallback needlessly, never the other way round.
+    """
+    count = 0
+    opened_at = None
+    for match in _P_TAG.finditer(html):
+        if not match.group(1):
+            if opened_at is not None:
+                return None
+            opened_at = match.end()
+            count += 1
+        elif opened_at is None or not _paragraph_is_clean(html, opened_at, match.start()):
+            return None
+        else:
+            opened_at = None
+    return count if opened_at is None else None
+
+
+def _collapse_whitespace(text, preserve):
+    if preserve or text.strip(_ASCII_SPACES):
+        return text
+    return "\n" if "\n" in text else " "
+
+
+def _element_text(element, preserve=False):
+    preserve = preserve or element.tag in _PRESERVE_WHITESPACE_TAGS
+    parts = []
+    if element.text:
+        parts.append(_collapse_whitespace(element.text, preserve))
+    for child in element:
+        # Comments and processing instructions have a non-string tag
+        if isinstance(child.tag, str) and child.tag not in _SKIP_TAGS:
+            parts.append(_element_text(child, preserve))
+        if child.tail:
+            parts.append(_collapse_whitespace(child.tail, preserve))
+    return "".join(parts)
+
+
+def _discard(element):
+    element.clear()
+    parent = element.getparent()
+    if parent is not None:
+        while element.getprevious() is not None:
+            del parent[0]
+
+
+def extract_with_lxml(html):
+    """Stream the page through lxml's pull parser and keep only <p> text.
+
+    Finished elements outside a paragraph are dropped as soon as they close, so
+    memory stays proportional to the largest paragraph rather than the page.
+
+    lxml closes an open <p> at the next <p> or block element, where html.parser
+    keeps nesting: "<p>x<div>y</div>z</p>" is "xyz" there but "x" here. Pages
+    with unclosed or interrupted paragraphs, or where lxml adds paragraphs of
+    its own, therefore go through BeautifulSoup.
+    """
+    expected_paragraphs = _clean_paragraph_count(html)
+    if expected_paragraphs is None:
+        return extract_with_beautifulsoup(html)
+    parser = etree.HTMLPullParser(events=("start", "end"))
+    paragraphs = []
+    open_paragraphs = 0
+    seen_paragraphs = 0
+
+    def drain():
+        nonlocal open_paragraphs, seen_paragraphs
+        for event, element in parser.read_events():
+            if element.tag != "p":
+                if event == "end" and open_paragraphs == 0:
+                    _discard(element)
+                continue
+            if event == "start":
+                open_paragraphs += 1
+                seen_paragraphs += 1
+                continue
+            open_paragraphs -= 1
+            preserve = any(
+                ancestor.tag in _PRESERVE_WHITESPACE_TAGS
+                for ancestor in element.iterancestors()
+            )
+            text = _element_text(element, preserve)
+            if text.strip():
+                paragraphs.append(text)
+            if open_paragraphs == 0:
+                _discard(element)
+
+    for start in range(0, len(html), FEED_CHUNK_SIZE):
+        parser.feed(html[start : start + FEED_CHUNK_SIZE])
+        drain()
+    try:
+        parser.close()
+    except etree.XMLSyntaxError:
+        # Raised for empty documents, which html.parser treats as no paragraphs
+        pass
+    drain()
+    if seen_paragraphs != expected_paragraphs:
+        # libxml2 wraps stray text, e.g. in <head>, in <p> elements of its own
+        return extract_with_beautifulsoup(html)
+    return "\n".join(paragraphs)
+
+
+EXTRACTORS = {"beautifulsoup": extract_with_beautifulsoup}
+if LXML_AVAILABLE:
+    EXTRACTORS["lxml"] = extract_with_lxml
+
+
+def get_extractor(name=None):
+    name = (name or HTML_EXTRACTOR).lower()
+    if name not in EXTRACTORS:
+        raise ValueError(
+            f"Unknown HTML extractor '{name}', available: {', '.join(EXTRACTORS)}"
+        )
+    return EXTRACTORS[name]
+
+
+async def extract_paragraphs(html, extractor=None):
+    extract = get_extractor(extractor)
+    if len(html) > OFFLOAD_THRESHOLD:
+        return await asyncio.to_thread(extract, html)
+    return extract(html)
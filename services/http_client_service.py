@@ -0,0 +1,126 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+import httpx
+from services import replay_service
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_MAX_IN_FLIGHT = int(os.getenv("HTTP_MAX_IN_FLIGHT", "32"))
+HTTP_PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", "4"))
+HTTP_PER_HOST_RPS = float(os.getenv("HTTP_PER_HOST_RPS", "0"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+
+try:
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class _ClientState:
+    def __init__(self, client, http2):
+        self.client = client
+        self.http2 = http2
+        self.in_flight = asyncio.Semaphore(HTTP_MAX_IN_FLIGHT)
+        self.host_semaphores = {}
+        self.host_locks = {}
+        self.host_next_slot = {}
+
+
+# httpx clients are bound to the event loop that created them. The API runs in
+# uvicorn's loop while scheduled reports run via asyncio.run in another thread,
+# so each loop gets its own pooled client.
+_states = {}
+
+
+def _build_state(logger=None):
+    http2 = HTTP2_ENABLED and HTTP2_AVAILABLE
+    if HTTP2_ENABLED and not HTTP2_AVAILABLE and logger:
+        logger.warning("[HTTP] HTTP2_ENABLED is set but 'h2' is not installed.")
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+    )
+    transport = None
+    if replay_service.is_enabled():
+        transport = replay_service.wrap_async_transport(
+            httpx.AsyncHTTPTransport(http2=http2, limits=limits)
+        )
+    client = httpx.AsyncClient(
+        timeout=HTTP_TIMEOUT, limits=limits, http2=http2, transport=transport
+    )
+    return _ClientState(client, http2)
+
+
+def _get_state(logger=None):
+    loop = asyncio.get_running_loop()
+    for stale_loop in [l for l in _states if l.is_closed()]:
+        del _states[stale_loop]
+    state = _states.get(loop)
+    if state is None or state.client.is_closed:
+        state = _build_state(logger)
+        _states[loop] = state
+    return state
+
+
+async def start_http_client(logger=None):
+    state = _get_state(logger)
+    if logger:
+        logger.info(
+            f"[HTTP] Shared client ready (http2={state.http2}, "
+            f"in_flight={HTTP_MAX_IN_FLIGHT}, per_host={HTTP_PER_HOST_LIMIT})"
+        )
+
+
+async def close_http_client(logger=None):
+    state = _states.pop(asyncio.get_running_loop(), None)
+    if state is not None:
+        await state.client.aclose()
+        if logger:
+            logger.info("[HTTP] Shared client closed.")
+
+
+@asynccontextmanager
+async def http_client_session(logger=None):
+    """Own the shared client for the current loop unless someone else already does."""
+    owner = asyncio.get_running_loop() not in _states
+    if owner:
+        await start_http_client(logger)
+    try:
+        yield
+    finally:
+        if owner:
+            await close_http_client(logger)
+
+
+async def _wait_for_host_slot(state, host):
+    if HTTP_PER_HOST_RPS <= 0:
+        return
+    lock = state.host_locks.setdefault(host, asyncio.Lock())
+    async with lock:
+        now = time.monotonic()
+        next_slot = state.host_next_slot.get(host, now)
+        if next_slot > now:
+            await asyncio.sleep(next_slot - now)
+        state.host_next_slot[host] = max(now, next_slot) + 1 / HTTP_PER_HOST_RPS
+
+
+async def request(method, url, logger=None, **kwargs):
+    state = _get_state(logger)
+    host = urlsplit(str(url)).netloc.lower()
+    host_semaphore = state.host_semaphores.setdefault(
+        host, asyncio.Semaphore(HTTP_PER_HOST_LIMIT)
+    )
+    async with host_semaphore:
+        await _wait_for_host_slot(state, host)
+        async with state.in_flight:
+            return await state.client.request(method, url, **kwargs)
+
+
+async def get(url, logger=None, **kwargs):
+    return await request("GET", url, logger=logger, **kwargs)
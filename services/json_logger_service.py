@@ -4,9 +4,13 @@ import json
 import datetime
 from pathlib import Path
 
+REPORTS_DIR = Path(
+    os.getenv("REPORTS_DIR", Path(__file__).resolve().parent.parent / "logs")
+)
+
 
 async def write_report_to_json(all_articles):
-    logs_dir = Path(__file__).resolve().parent.parent / "logs"
+    logs_dir = REPORTS_DIR
     logs_dir.mkdir(parents=True, exist_ok=True)
 
     filename = f"{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json"
@@ -19,8 +23,14 @@ async def write_report_to_json(all_articles):
 
 
 def get_latest_json_file():
-    logs_dir = Path(__file__).resolve().parent.parent / "logs"
+    logs_dir = REPORTS_DIR
     json_files = sorted(logs_dir.glob("*.json"), reverse=True)
     if not json_files:
         return None
     return json_files[0]
+
+
+def get_recent_json_files(limit):
+    """The newest `limit` reports, oldest first."""
+    json_files = sorted(REPORTS_DIR.glob("*.json"), reverse=True)[:limit]
+    return list(reversed(json_files))
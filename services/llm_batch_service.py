@@ -0,0 +1,147 @@
+import asyncio
+import datetime
+import json
+import os
+import time
+import openai
+from services import metrics_service, replay_service
+from services.cache_db_service import CACHE_DIR
+
+# "off" processes articles online, "scheduled" uses batch jobs for the background
+# runs only and "always" also for /report requests
+LLM_BATCH_MODE = os.getenv("LLM_BATCH_MODE", "off").lower()
+# Any server implementing the OpenAI Files and Batches API, e.g. a local stand-in
+LLM_BATCH_BASE_URL = os.getenv("LLM_BATCH_BASE_URL") or None
+LLM_BATCH_POLL_INTERVAL = float(os.getenv("LLM_BATCH_POLL_INTERVAL", "60"))
+LLM_BATCH_TIMEOUT = float(os.getenv("LLM_BATCH_TIMEOUT", str(24 * 3600)))
+BATCH_DIR = CACHE_DIR / "batches"
+BATCH_REQUEST_URL = "/v1/chat/completions"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+# Batch requests are billed at half the online price
+BATCH_PRICE_FACTOR = 0.5
+
+
+class OpenAIBatchEndpoint:
+    """Submits JSONL batch files through the OpenAI Files and Batches API.
+
+    Other endpoints only need the same four coroutines: submit(path) -> job id,
+    poll(job id) -> (status, output file id), download(file id) -> JSONL text
+    and cancel(job id).
+    """
+
+    def __init__(self, base_url=LLM_BATCH_BASE_URL, api_key=None, http_client=None):
+        self.client = openai.AsyncOpenAI(
+            base_url=base_url,
+            api_key=api_key or os.getenv("OPENAI_API_KEY"),
+            http_client=http_client
+            or replay_service.openai_http_clients().get("http_async_client"),
+        )
+
+    async def submit(self, path):
+        with open(path, "rb") as f:
+            uploaded = await self.client.files.create(file=f, purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=BATCH_REQUEST_URL,
+            completion_window="24h",
+        )
+        return batch.id
+
+    async def poll(self, job_id):
+        batch = await self.client.batches.retrieve(job_id)
+        return batch.status, batch.output_file_id
+
+    async def download(self, file_id):
+        response = await self.client.files.content(file_id)
+        return response.text
+
+    async def cancel(self, job_id):
+        await self.client.batches.cancel(job_id)
+
+    async def close(self):
+        await self.client.close()
+
+
+def build_request(custom_id, body):
+    return {"custom_id": custom_id, "method": "POST", "url": BATCH_REQUEST_URL, "body": body}
+
+
+def write_batch_file(requests):
+    BATCH_DIR.mkdir(parents=True, exist_ok=True)
+    path = BATCH_DIR / f"{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for request in requests:
+            f.write(json.dumps(request, ensure_ascii=False) + "\n")
+    return path
+
+
+def parse_batch_output(text):
+    """Map each custom_id in a batch output file to its message content.
+
+    Requests that errored or returned a non-200 status map to None. The token
+    usage of every request is recorded, as batch requests are billed too.
+    """
+    outputs = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        response = entry.get("response") or {}
+        body = response.get("body") or {}
+        usage = body.get("usage")
+        if usage:
+            metrics_service.record_tokens(
+                body.get("model"),
+                usage.get("prompt_tokens", 0),
+                usage.get("completion_tokens", 0),
+                price_factor=BATCH_PRICE_FACTOR,
+            )
+        if entry.get("error") or response.get("status_code") != 200:
+            outputs[entry["custom_id"]] = None
+            continue
+        choices = body.get("choices") or [{}]
+        outputs[entry["custom_id"]] = choices[0].get("message", {}).get("content")
+    return outputs
+
+
+async def run_batch(logger, requests, endpoint=None):
+    """Write requests to a JSONL file, submit it and wait for the results.
+
+    Returns a dict of custom_id -> message content. Requests without a usable
+    result are missing from it (or None), so callers can fall back to online
+    processing for them.
+    """
+    if not requests:
+        return {}
+    owns_endpoint = endpoint is None
+    endpoint = endpoint or OpenAIBatchEndpoint()
+    try:
+        path = await asyncio.to_thread(write_batch_file, requests)
+        job_id = await endpoint.submit(path)
+        logger.info(f"[LLM Batch] Submitted {len(requests)} requests as {job_id} ({path.name}).")
+
+        deadline = time.monotonic() + LLM_BATCH_TIMEOUT
+        while True:
+            status, output_file_id = await endpoint.poll(job_id)
+            if status in TERMINAL_STATUSES:
+                break
+            if time.monotonic() >= deadline:
+                logger.warning(f"[LLM Batch] {job_id} timed out while {status}, cancelling.")
+                await endpoint.cancel(job_id)
+                return {}
+            await asyncio.sleep(LLM_BATCH_POLL_INTERVAL)
+
+        logger.info(f"[LLM Batch] {job_id} finished with status '{status}'.")
+        if not output_file_id:
+            return {}
+        # Expired batches still return the requests that completed in time
+        outputs = parse_batch_output(await endpoint.download(output_file_id))
+        succeeded = sum(1 for content in outputs.values() if content is not None)
+        logger.info(f"[LLM Batch] {succeeded}/{len(requests)} requests returned a result.")
+        return outputs
+    except Exception as e:
+        logger.error(f"[LLM Batch] Batch job failed: {e}")
+        return {}
+    finally:
+        if owns_endpoint:
+            await endpoint.close()
@@ -0,0 +1,96 @@
+import hashlib
+import os
+import time
+from services.cache_db_service import cache_db
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(30 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_results (
+    key TEXT PRIMARY KEY,
+    result TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    model TEXT NOT NULL,
+    categories_version TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS llm_results_created_at ON llm_results (created_at);
+"""
+
+
+def fingerprint(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def cache_key(content, prompt_version, model, categories_version):
+    normalized = " ".join(content.split())
+    return hashlib.sha256(
+        "\x00".join([normalized, prompt_version, model, categories_version]).encode("utf-8")
+    ).hexdigest()
+
+
+def get_result(key):
+    """Return the cached ReportOutput JSON for a key, or None."""
+    if not LLM_CACHE_ENABLED:
+        return None
+    with cache_db("llm_results", _SCHEMA) as db:
+        row = db.execute(
+            "SELECT result FROM llm_results WHERE key = ? AND created_at >= ?",
+            (key, time.time() - LLM_CACHE_TTL),
+        ).fetchone()
+    return row["result"] if row else None
+
+
+def store_result(key, result_json, prompt_version, model, categories_version):
+    if not LLM_CACHE_ENABLED:
+        return
+    with cache_db("llm_results", _SCHEMA) as db:
+        db.execute(
+            "INSERT OR REPLACE INTO llm_results "
+            "(key, result, prompt_version, model, categories_version, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, result_json, prompt_version, model, categories_version, time.time()),
+        )
+
+
+def evict(logger=None):
+    with cache_db("llm_results", _SCHEMA) as db:
+        expired = db.execute(
+            "DELETE FROM llm_results WHERE created_at < ?", (time.time() - LLM_CACHE_TTL,)
+        ).rowcount
+        overflow = db.execute(
+            "DELETE FROM llm_results WHERE key IN ("
+            "SELECT key FROM llm_results ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (LLM_CACHE_MAX_ENTRIES,),
+        ).rowcount
+    if logger and (expired or overflow):
+        logger.info(f"[LLM Cache] Evicted {expired} expired and {overflow} overflow entries.")
+
+
+def invalidate(prompt_version=None, model=None, categories_version=None, logger=None):
+    """Drop entries that do not match the given versions; with no arguments, drop all."""
+    conditions = []
+    params = []
+    for column, value in (
+        ("prompt_version", prompt_version),
+        ("model", model),
+        ("categories_version", categories_version),
+    ):
+        if value is not None:
+            conditions.append(f"{column} != ?")
+            params.append(value)
+    query = "DELETE FROM llm_results"
+    if conditions:
+        query += " WHERE " + " OR ".join(conditions)
+    with cache_db("llm_results", _SCHEMA) as db:
+        removed = db.execute(query, params).rowcount
+    if logger:
+        logger.info(f"[LLM Cache] Invalidated {removed} entries.")
+    return removed
+
+
+if __name__ == "__main__":
+    # python -m services.llm_cache_service: clear every cached LLM result
+    print(f"Removed {invalidate()} cached LLM results.")
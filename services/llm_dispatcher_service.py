@@ -0,0 +1,306 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import aclosing, asynccontextmanager, contextmanager
+import openai
+from services import metrics_service
+from logger import logger
+
+LLM_MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_INITIAL_CONCURRENCY = int(os.getenv("LLM_INITIAL_CONCURRENCY", "4"))
+# Seconds a whole non-streamed call may take before concurrency shrinks
+LLM_LATENCY_TARGET = float(os.getenv("LLM_LATENCY_TARGET", "30"))
+# Streams are judged by their first token, as long outputs take long anyway
+LLM_FIRST_TOKEN_TARGET = float(os.getenv("LLM_FIRST_TOKEN_TARGET", "10"))
+LLM_RPM = int(os.getenv("LLM_RPM", "500"))
+LLM_TPM = int(os.getenv("LLM_TPM", "200000"))
+LLM_RATE_LIMIT_RETRIES = int(os.getenv("LLM_RATE_LIMIT_RETRIES", "4"))
+DEFAULT_OUTPUT_TOKENS = 1_000
+BUDGET_WINDOW = 60.0
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+class LLMDispatcher:
+    """Shared gate for every LLM call.
+
+    Concurrency follows AIMD: it grows by roughly one slot per window of fast
+    successes, halves on rate-limit errors and shrinks on slow responses (slow
+    to complete, or for streams slow to start). Calls are also
+    held back until they fit in the requests-per-minute and tokens-per-minute
+    budgets. Works from any event loop as well as from plain threads.
+    """
+
+    def __init__(
+        self,
+        initial=LLM_INITIAL_CONCURRENCY,
+        minimum=LLM_MIN_CONCURRENCY,
+        maximum=LLM_MAX_CONCURRENCY,
+        rpm=LLM_RPM,
+        tpm=LLM_TPM,
+    ):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.rpm = rpm
+        self.tpm = tpm
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self._lock = threading.Lock()
+        self._waiters = deque()
+        self._window = deque()
+        self._window_tokens = 0
+
+    # Concurrency slots
+
+    def _has_slot(self):
+        return self.in_flight < int(self.limit)
+
+    def _wake_waiters(self):
+        while self._waiters and self._has_slot():
+            waiter = self._waiters.popleft()
+            self.in_flight += 1
+            if isinstance(waiter, threading.Event):
+                waiter.set()
+            else:
+                loop, future = waiter
+                loop.call_soon_threadsafe(self._hand_over, future)
+
+    def _hand_over(self, future):
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+    async def acquire_async(self):
+        with self._lock:
+            if self._has_slot() and not self._waiters:
+                self.in_flight += 1
+                return
+            future = asyncio.get_running_loop().create_future()
+            waiter = (asyncio.get_running_loop(), future)
+            self._waiters.append(waiter)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+            raise
+
+    def acquire_sync(self):
+        with self._lock:
+            if self._has_slot() and not self._waiters:
+                self.in_flight += 1
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self._wake_waiters()
+
+    # Rate budgets
+
+    def _reserve_budget(self, tokens):
+        """Reserve budget for a call.
+
+        Returns (0, entry) once reserved, or (delay, None) when the caller should
+        wait and try again.
+        """
+        with self._lock:
+            now = time.monotonic()
+            while self._window and self._window[0][0] <= now - BUDGET_WINDOW:
+                self._window_tokens -= self._window.popleft()[1]
+            delay = max(self.cooldown_until - now, 0.0)
+            if len(self._window) >= self.rpm:
+                delay = max(delay, self._window[0][0] + BUDGET_WINDOW - now)
+            tokens = min(tokens, self.tpm)
+            if self._window_tokens + tokens > self.tpm:
+                freed = 0
+                for started, used in self._window:
+                    freed += used
+                    if self._window_tokens - freed + tokens <= self.tpm:
+                        delay = max(delay, started + BUDGET_WINDOW - now)
+                        break
+            if delay > 0:
+                return delay, None
+            entry = [now, tokens]
+            self._window.append(entry)
+            self._window_tokens += tokens
+            return 0.0, entry
+
+    def _record_usage(self, entry, actual):
+        """Replace a reservation's estimate with the tokens the call really used."""
+        if actual is None:
+            return
+        with self._lock:
+            if entry[0] > time.monotonic() - BUDGET_WINDOW:
+                self._window_tokens += actual - entry[1]
+                entry[1] = actual
+
+    # Feedback
+
+    def _on_success(self, latency, target):
+        with self._lock:
+            if latency > target:
+                self.limit = max(self.minimum, self.limit * 0.75)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._wake_waiters()
+
+    def _on_rate_limited(self, retry_after):
+        with self._lock:
+            self.limit = max(self.minimum, self.limit / 2)
+            self.cooldown_until = max(self.cooldown_until, time.monotonic() + retry_after)
+        logger.warning(
+            f"[LLM Dispatcher] Rate limited, concurrency reduced to {int(self.limit)}, cooling down {retry_after:.1f}s."
+        )
+
+    def stats(self):
+        with self._lock:
+            return {
+                "limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "waiting": len(self._waiters),
+                "requests_last_minute": len(self._window),
+                "tokens_last_minute": self._window_tokens,
+            }
+
+    # Entry points
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens):
+        """Hold a concurrency slot; yields the budget entry for _record_usage."""
+        while True:
+            delay, entry = self._reserve_budget(estimated_tokens)
+            if entry is not None:
+                break
+            await asyncio.sleep(delay)
+        await self.acquire_async()
+        try:
+            yield entry
+        finally:
+            self.release()
+
+    @contextmanager
+    def slot_sync(self, estimated_tokens):
+        while True:
+            delay, entry = self._reserve_budget(estimated_tokens)
+            if entry is not None:
+                break
+            time.sleep(delay)
+        self.acquire_sync()
+        try:
+            yield entry
+        finally:
+            self.release()
+
+    async def _back_off(self, error, attempt):
+        if isinstance(error, openai.RateLimitError):
+            self._on_rate_limited(_retry_after(error, attempt))
+        else:
+            await asyncio.sleep(2**attempt)
+
+    async def ainvoke(self, llm, messages, input_tokens=None, output_tokens=DEFAULT_OUTPUT_TOKENS):
+        """Run llm.ainvoke(messages) under the shared limits, retrying rate-limit errors."""
+        estimated = _estimate_tokens(messages, input_tokens) + output_tokens
+        for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+            try:
+                async with self.slot(estimated) as entry:
+                    started = time.monotonic()
+                    result = await llm.ainvoke(messages)
+                    self._on_success(time.monotonic() - started, LLM_LATENCY_TARGET)
+                    metrics_service.observe_stage("llm_call", time.monotonic() - started)
+            except RETRYABLE_ERRORS as e:
+                if attempt == LLM_RATE_LIMIT_RETRIES:
+                    raise
+                await self._back_off(e, attempt)
+                continue
+            usage = getattr(result, "usage_metadata", None) or {}
+            self._record_usage(entry, usage.get("total_tokens"))
+            _record_tokens(result, usage)
+            return result
+
+    async def astream(self, llm, messages, input_tokens=None, output_tokens=DEFAULT_OUTPUT_TOKENS):
+        """Stream llm.astream(messages) under the shared limits.
+
+        Errors before the first chunk are retried like ainvoke. Closing the
+        generator early aborts the request and frees the slot, so consumers
+        should iterate it inside contextlib.aclosing.
+        """
+        estimated = _estimate_tokens(messages, input_tokens) + output_tokens
+        for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+            received = False
+            try:
+                async with self.slot(estimated) as entry:
+                    started = time.monotonic()
+                    first_token_latency = None
+                    usage = {}
+                    last_chunk = None
+                    chunks = 0
+                    try:
+                        async with aclosing(llm.astream(messages)) as stream:
+                            async for chunk in stream:
+                                if not received:
+                                    first_token_latency = time.monotonic() - started
+                                received = True
+                                last_chunk = chunk
+                                chunks += 1
+                                usage = getattr(chunk, "usage_metadata", None) or usage
+                                yield chunk
+                    finally:
+                        if received:
+                            self._on_success(first_token_latency, LLM_FIRST_TOKEN_TARGET)
+                            metrics_service.observe_stage(
+                                "llm_call", time.monotonic() - started
+                            )
+                            # Streams closed early never report usage; each chunk is about a token
+                            _record_tokens(
+                                last_chunk,
+                                usage
+                                or {"input_tokens": estimated - output_tokens, "output_tokens": chunks},
+                            )
+                        self._record_usage(entry, usage.get("total_tokens"))
+                return
+            except RETRYABLE_ERRORS as e:
+                if received or attempt == LLM_RATE_LIMIT_RETRIES:
+                    raise
+                await self._back_off(e, attempt)
+
+
+def _record_tokens(message, usage):
+    if not usage:
+        return
+    model = (getattr(message, "response_metadata", None) or {}).get("model_name")
+    metrics_service.record_tokens(
+        model, usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    )
+
+
+def _estimate_tokens(messages, input_tokens):
+    if input_tokens is not None:
+        return input_tokens
+    return sum(len(str(m.get("content", ""))) for m in messages) // 4
+
+
+def _retry_after(error, attempt):
+    response = getattr(error, "response", None)
+    header = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(header)
+    except (TypeError, ValueError):
+        return float(2**attempt)
+
+
+dispatcher = LLMDispatcher()
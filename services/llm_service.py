@@ -1,9 +1,18 @@
 import os
 import re
 import json
-import tiktoken
+import asyncio
+from contextlib import aclosing
 from pydantic import BaseModel, ValidationError
-from services.scraper_service import fetch_article_content
+from services.token_budget_service import fit_to_budget, split_into_chunks
+from services import (
+    llm_cache_service,
+    llm_batch_service,
+    metrics_service,
+    relevance_service,
+    replay_service,
+)
+from services.llm_dispatcher_service import dispatcher
 from logger import logger
 from langchain_openai import ChatOpenAI
 from json_repair import repair_json
@@ -11,15 +20,32 @@ from dotenv import load_dotenv
 
 CATEGORIES_FILE = os.path.join(os.path.dirname(__file__), "../categories.json")
 with open(CATEGORIES_FILE, "r") as f:
-    CATEGORIES_INDEX = json.load(f)["categories"]
+    CATEGORIES_RAW = f.read()
+    CATEGORIES_INDEX = json.loads(CATEGORIES_RAW)["categories"]
 
 OPENAI_MODEL = "gpt-4o-mini"
 MAX_TOTAL_TOKENS = 200_000
 RESERVED_OUTPUT_TOKENS = 5_000
 MAX_INPUT_TOKENS = MAX_TOTAL_TOKENS - RESERVED_OUTPUT_TOKENS
+# Stream completions and stop generating once an article is rejected
+LLM_STREAMING = os.getenv("LLM_STREAMING", "true").lower() == "true"
+# Prompts above this many tokens are summarized chunk by chunk (map) before the
+# report prompt runs on the combined summaries (reduce); 0 disables this
+LONG_DOCUMENT_THRESHOLD = int(os.getenv("LONG_DOCUMENT_THRESHOLD", "32000"))
+LONG_DOCUMENT_CHUNK_TOKENS = int(os.getenv("LONG_DOCUMENT_CHUNK_TOKENS", "8000"))
+CHUNK_SUMMARY_MAX_TOKENS = int(os.getenv("CHUNK_SUMMARY_MAX_TOKENS", "700"))
 
 load_dotenv()
-llm = ChatOpenAI(model=OPENAI_MODEL, temperature=0.2, api_key=os.getenv("OPENAI_API_KEY"))
+# Retries are handled by the dispatcher so it can see and react to rate limits
+llm = ChatOpenAI(
+    model=OPENAI_MODEL,
+    temperature=0.2,
+    api_key=os.getenv("OPENAI_API_KEY"),
+    max_retries=0,
+    stream_usage=True,
+    **replay_service.openai_http_clients(),
+)
+chunk_llm = llm.bind(max_tokens=CHUNK_SUMMARY_MAX_TOKENS)
 
 
 class LoggingOutput(BaseModel):
@@ -71,34 +97,93 @@ You are a professional tech analyst. Perform these tasks based on the provided c
 - If there are issues, explain the nature of the issues.
 
 8. Ensure the output is a valid JSON block with the following structure (never leave out any keys):
+- Write the keys in exactly this order: 'logging' first, starting with 'logging.status' and 'logging.retry', then 'response'.
 {{
+    "logging": {{
+        "status":"<Accepted|Rejected|Error>",
+        "retry": <true|false>,
+        "missing_categories": [],
+        "reason": "<reasoning>"
+    }},
     "response": {{
         "categories": [],
         "insights": [],
         "summary": "<summary>"
-    }},
-    "logging": {{
-        "status":"<Accepted|Rejected|Error>",
-        "reason": "<reasoning>",
-        "retry": <true|false>,
-        "missing_categories": []
     }}
 }}
 """
 
+chunk_prompt = """
+You are a professional tech analyst. The content is one section of a longer article, paper or transcript.
+Summarize this section as plain text for an analyst who will only read the section summaries:
+- Keep every key point, finding, figure, name and technology mentioned.
+- Leave out navigation, boilerplate and repetition.
+- Do not add an introduction or conclusion of your own.
+"""
+
+# Bump PROMPT_REVISION to invalidate cached results without editing the prompt text
+PROMPT_REVISION = "1"
+PROMPT_VERSION = f"{PROMPT_REVISION}-{llm_cache_service.fingerprint(system_prompt + chunk_prompt)}"
+CATEGORIES_VERSION = llm_cache_service.fingerprint(CATEGORIES_RAW)
+
+
+def prepare_result_cache(logger=logger):
+    """Drop cached results from older prompts, models or categories and evict old ones."""
+    llm_cache_service.invalidate(
+        PROMPT_VERSION, OPENAI_MODEL, CATEGORIES_VERSION, logger=logger
+    )
+    llm_cache_service.evict(logger=logger)
+
 
 def truncate_to_fit(content):
-    encoding = tiktoken.encoding_for_model(OPENAI_MODEL)
-    while True:
-        total_tokens = len(encoding.encode(system_prompt)) + len(
-            encoding.encode("Article Content:\n" + content)
+    """Return the content cut to the input token budget and the prompt's token count."""
+    with metrics_service.timed("truncation"):
+        safe_content, total_tokens = fit_to_budget(
+            content, system_prompt, MAX_INPUT_TOKENS, OPENAI_MODEL
         )
-        if total_tokens <= MAX_INPUT_TOKENS:
-            return content
+    if len(safe_content) < len(content):
         logger.warning(
-            f"[LLM] Truncating content. Current estimated tokens: {total_tokens}"
+            f"[LLM] Truncated content from {len(content)} to {len(safe_content)} characters ({total_tokens} tokens)."
         )
-        content = content[: int(len(content) * 0.9)]
+    return safe_content, total_tokens
+
+
+_STATUS_PATTERN = re.compile(r'"status"\s*:\s*"(Accepted|Rejected|Error)"')
+_RETRY_PATTERN = re.compile(r'"retry"\s*:\s*(true|false)')
+
+
+async def condense_long_content(content):
+    """Summarize content chunk by chunk so the report prompt runs on the summaries.
+
+    Chunks are summarized in parallel under the shared dispatcher. Returns the
+    combined summaries and their prompt token count, or None if a chunk fails.
+    """
+    chunks = await asyncio.to_thread(
+        split_into_chunks, content, LONG_DOCUMENT_CHUNK_TOKENS, OPENAI_MODEL
+    )
+    try:
+        summaries = await asyncio.gather(
+            *(
+                dispatcher.ainvoke(
+                    chunk_llm,
+                    [
+                        {"role": "system", "content": chunk_prompt},
+                        {"role": "user", "content": chunk},
+                    ],
+                    input_tokens=LONG_DOCUMENT_CHUNK_TOKENS,
+                    output_tokens=CHUNK_SUMMARY_MAX_TOKENS,
+                )
+                for chunk in chunks
+            )
+        )
+    except Exception as e:
+        logger.warning(f"[LLM] Chunk summarization failed, using the full prompt: {e}")
+        return None
+    condensed = "\n\n".join(
+        f"Section {index} of {len(chunks)}:\n{summary.content.strip()}"
+        for index, summary in enumerate(summaries, 1)
+    )
+    return await asyncio.to_thread(truncate_to_fit, condensed)
 
 
 def extract_json_block(text):
@@ -108,83 +193,294 @@ def extract_json_block(text):
     return text.strip()
 
 
+class StatusScanner:
+    """Incrementally picks 'logging.status' and 'logging.retry' out of a JSON stream.
+
+    The prompt asks for both before anything else, so they are complete after
+    the first few chunks. Only the text since the last match is rescanned.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.status = None
+        self.retry = None
+        self._scan_from = 0
+
+    def feed(self, chunk):
+        self.text += chunk
+        # Back up a little so keys split across chunks are still found
+        window = self.text[max(self._scan_from - 32, 0):]
+        if self.status is None:
+            match = _STATUS_PATTERN.search(window)
+            if match:
+                self.status = match.group(1)
+        if self.retry is None:
+            match = _RETRY_PATTERN.search(window)
+            if match:
+                self.retry = match.group(1) == "true"
+        self._scan_from = len(self.text)
+
+    def should_stop(self):
+        return self.status in ("Rejected", "Error") and self.retry is not None
+
+
+async def stream_report_output(messages, input_tokens):
+    """Stream a completion, stopping as soon as the article is Rejected or Error.
+
+    Accepted articles are read to the end and parsed as usual; stopped streams
+    return a ReportOutput built from the status fields alone.
+    """
+    scanner = StatusScanner()
+    async with aclosing(
+        dispatcher.astream(llm, messages, input_tokens=input_tokens)
+    ) as stream:
+        async for chunk in stream:
+            scanner.feed(chunk.content)
+            if scanner.should_stop():
+                break
+        else:
+            return parse_report_output(scanner.text)
+
+    return ReportOutput(
+        response=ResponseOutput(categories=[], insights=[], summary=""),
+        logging=LoggingOutput(
+            status=scanner.status,
+            reason=f"Generation stopped early after status '{scanner.status}'.",
+            retry=scanner.retry,
+            missing_categories=[],
+        ),
+    )
+
+
+def build_messages(content):
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": content},
+    ]
+
+
+def parse_report_output(text):
+    with metrics_service.timed("parse"):
+        raw_json = extract_json_block(text)
+        repaired = repair_json(raw_json)
+        parsed_dict = json.loads(repaired)
+        return ReportOutput.model_validate(parsed_dict)
+
+
+def result_cache_key(content):
+    return llm_cache_service.cache_key(
+        content, PROMPT_VERSION, OPENAI_MODEL, CATEGORIES_VERSION
+    )
+
+
+def cache_report_output(cache_key, parsed_result):
+    if (
+        parsed_result.logging.status in ("Accepted", "Rejected")
+        and not parsed_result.logging.retry
+    ):
+        llm_cache_service.store_result(
+            cache_key,
+            parsed_result.model_dump_json(),
+            PROMPT_VERSION,
+            OPENAI_MODEL,
+            CATEGORIES_VERSION,
+        )
+
+
+def build_result(article, parsed_result, full_content):
+    logger.info(f"[LLM] {parsed_result.logging.status}: {article['url']}")
+    return {
+        "logging": parsed_result.logging.model_dump(),
+        "response": parsed_result.response.model_dump(),
+        "metadata": {
+            "source": article.get("url", ""),
+            "title": article.get("title", ""),
+            "raw_content": full_content,
+            "missing_categories": parsed_result.logging.missing_categories,
+        },
+    }
+
+
+def build_error_result(article, reason, full_content):
+    return {
+        "logging": {
+            "status": "Error",
+            "reason": reason,
+            "retry": False,
+            "missing_categories": [],
+        },
+        "response": {"categories": [], "summary": "", "insights": []},
+        "metadata": {
+            "source": article.get("url", ""),
+            "title": article.get("title", ""),
+            "raw_content": full_content,
+            "missing_categories": []
+        },
+    }
+
+
+def build_prefilter_result(article, score):
+    logger.info(f"[LLM] Rejected by prefilter ({score:.3f}): {article['url']}")
+    return {
+        "logging": {
+            "status": "Rejected",
+            "reason": f"{relevance_service.PREFILTER_REASON_PREFIX}: relevance score {score:.3f} is below {relevance_service.RELEVANCE_THRESHOLD}",
+            "retry": False,
+            "missing_categories": [],
+        },
+        "response": {"categories": [], "summary": "", "insights": []},
+        "metadata": {
+            "source": article.get("url", ""),
+            "title": article.get("title", ""),
+            "raw_content": article.get("content", ""),
+            "missing_categories": [],
+            "relevance_score": score,
+        },
+    }
+
+
+async def apply_prefilter(article):
+    """Return a Rejected result for clearly off-topic content, or None."""
+    passes, score = await asyncio.to_thread(relevance_service.prefilter, article)
+    return None if passes else build_prefilter_result(article, score)
+
+
+def log_missing_categories(article, parsed_result):
+    for cat in parsed_result.logging.missing_categories:
+        logger.warning(
+            f"[LLM] Found missing category '{cat}' for article: {article['url']}"
+        )
+
+
 async def process_article(article):
-    retries_left = article.get("retries_left", 1)
+    """Run one LLM pass over the article's current content.
+
+    A result with logging.retry set is returned as is; re-scraping and
+    resubmitting it is up to the caller, so no LLM slot is held meanwhile.
+    """
     full_content = article.get("content", "")
+    prefiltered = await apply_prefilter(article)
+    if prefiltered:
+        return prefiltered
 
-    while True:
-        safe_content = truncate_to_fit(full_content)
-        try:
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": safe_content},
-            ]
-            result = await llm.ainvoke(messages)
-            raw_json = extract_json_block(result.content)
-            repaired = repair_json(raw_json)
-            parsed_dict = json.loads(repaired)
-            parsed_result = ReportOutput.model_validate(parsed_dict)
-
-            for cat in parsed_result.logging.missing_categories:
-                logger.warning(
-                    f"[LLM] Found missing category '{cat}' for article: {article['url']}"
+    safe_content, article["input_tokens"] = await asyncio.to_thread(
+        truncate_to_fit, full_content
+    )
+    try:
+        cache_key = result_cache_key(safe_content)
+        cached = llm_cache_service.get_result(cache_key)
+        metrics_service.record_cache("llm_results", cached is not None)
+        if cached:
+            logger.info(f"[LLM] Cache hit for: {article['url']}")
+            parsed_result = ReportOutput.model_validate_json(cached)
+        else:
+            prompt_content = safe_content
+            input_tokens = article["input_tokens"]
+            if 0 < LONG_DOCUMENT_THRESHOLD < input_tokens:
+                logger.info(
+                    f"[LLM] Long document ({input_tokens} tokens), summarizing in chunks: {article['url']}"
                 )
-
-            if parsed_result.logging.retry:
-                if retries_left > 0:
-                    logger.info(
-                        f"[LLM] Retry triggered for: {article['url']} (Remaining retries: {retries_left})"
-                    )
-                    new_method, new_content = await fetch_article_content(
-                        logger, article["url"], method="selenium"
-                    )
-                    if new_content:
-                        full_content = new_content
-                        article["method"] = "Selenium"
-                        retries_left -= 1
-                        continue
-                    else:
-                        logger.error(f"[Scraper] Selenium failed for: {article['url']}")
-                else:
-                    logger.warning(f"[LLM] No retries left for: {article['url']}")
-
-            logger.info(f"[LLM] {parsed_result.logging.status}: {article['url']}")
-            return {
-                "logging": parsed_result.logging.model_dump(),
-                "response": parsed_result.response.model_dump(),
-                "metadata": {
-                    "source": article.get("url", ""),
-                    "title": article.get("title", ""),
-                    "raw_content": full_content,
-                    "missing_categories": parsed_result.logging.missing_categories,
+                condensed = await condense_long_content(safe_content)
+                if condensed:
+                    prompt_content, input_tokens = condensed
+            messages = build_messages(prompt_content)
+            if LLM_STREAMING:
+                parsed_result = await stream_report_output(messages, input_tokens)
+            else:
+                result = await dispatcher.ainvoke(
+                    llm, messages, input_tokens=input_tokens
+                )
+                parsed_result = parse_report_output(result.content)
+            cache_report_output(cache_key, parsed_result)
+
+        log_missing_categories(article, parsed_result)
+        return build_result(article, parsed_result, full_content)
+
+    except (json.JSONDecodeError, ValidationError, Exception) as e:
+        logger.error(f"[LLM] JSON Parsing or Validation Error: {e}")
+        return build_error_result(article, str(e), full_content)
+
+
+async def process_articles_batch(articles, endpoint=None):
+    """Process articles through one offline batch job instead of a request each.
+
+    Cached results are used directly and articles the batch returns no usable
+    result for go through process_article. As there, retry results are returned
+    for the caller to handle. Results keep the order of the input articles.
+    """
+    results = [None] * len(articles)
+    pending = {}
+    requests = []
+    for index, article in enumerate(articles):
+        results[index] = await apply_prefilter(article)
+        if results[index]:
+            continue
+        safe_content, article["input_tokens"] = await asyncio.to_thread(
+            truncate_to_fit, article.get("content", "")
+        )
+        cache_key = result_cache_key(safe_content)
+        cached = llm_cache_service.get_result(cache_key)
+        metrics_service.record_cache("llm_results", cached is not None)
+        if cached:
+            logger.info(f"[LLM] Cache hit for: {article['url']}")
+            parsed_result = ReportOutput.model_validate_json(cached)
+            log_missing_categories(article, parsed_result)
+            results[index] = build_result(article, parsed_result, article.get("content", ""))
+            continue
+        pending[str(index)] = cache_key
+        requests.append(
+            llm_batch_service.build_request(
+                str(index),
+                {
+                    "model": OPENAI_MODEL,
+                    "temperature": llm.temperature,
+                    "messages": build_messages(safe_content),
                 },
-            }
+            )
+        )
 
+    outputs = await llm_batch_service.run_batch(logger, requests, endpoint)
+
+    fallback = []
+    for custom_id, cache_key in pending.items():
+        index = int(custom_id)
+        article = articles[index]
+        content = outputs.get(custom_id)
+        if content is None:
+            logger.warning(f"[LLM Batch] No result for {article['url']}, processing online.")
+            fallback.append(index)
+            continue
+        try:
+            parsed_result = parse_report_output(content)
         except (json.JSONDecodeError, ValidationError, Exception) as e:
             logger.error(f"[LLM] JSON Parsing or Validation Error: {e}")
-            return {
-                "logging": {
-                    "status": "Error",
-                    "reason": str(e),
-                    "retry": False,
-                    "missing_categories": [],
-                },
-                "response": {"categories": [], "summary": "", "insights": []},
-                "metadata": {
-                    "source": article.get("url", ""),
-                    "title": article.get("title", ""),
-                    "raw_content": full_content,
-                    "missing_categories": []
-                },
-            }
-
-async def validate_article_url(url, title):
-    """Use LLM to determine if a URL is an actual article."""
+            results[index] = build_error_result(article, str(e), article.get("content", ""))
+            continue
+        cache_report_output(cache_key, parsed_result)
+        log_missing_categories(article, parsed_result)
+        results[index] = build_result(article, parsed_result, article.get("content", ""))
+
+    online_results = await asyncio.gather(
+        *(process_article(articles[index]) for index in fallback)
+    )
+    for index, result in zip(fallback, online_results):
+        results[index] = result
+    return results
+
+
+async def validate_article_urls(items):
+    """Use one LLM call to classify many (url, title) pairs as article or not.
+
+    Returns one (is_article, reason) tuple per item, or None for items the model
+    did not return a verdict for.
+    """
+    listing = "\n".join(
+        f"{index}. URL: {url} | Title: {title}" for index, (url, title) in enumerate(items, 1)
+    )
     validation_prompt = f"""
-You are a URL validator. Determine if the given URL and title represent an actual article or just a category/section page.
+You are a URL validator. For each numbered URL and title below, determine if it represents an actual article or just a category/section page.
 
-URL: {url}
-Title: {title}
+{listing}
 
 Rules for determining if it's an article:
 1. It should be a specific piece of content, not a category listing
@@ -192,10 +488,11 @@ Rules for determining if it's an article:
 3. It should not be a general page like "/technology/" or "/news/"
 4. It should be a detailed article, story, or report
 
-Respond with a JSON object:
+Respond with a JSON object containing one result per numbered item:
 {{
-    "is_article": true/false,
-    "reason": "brief explanation of your decision"
+    "results": [
+        {{"id": 1, "is_article": true/false, "reason": "brief explanation of your decision"}}
+    ]
 }}
 
 Examples:
@@ -210,12 +507,37 @@ Examples:
             {"role": "system", "content": "You are a URL validator. Respond only with valid JSON."},
             {"role": "user", "content": validation_prompt},
         ]
-        result = await llm.ainvoke(messages)
+        result = await dispatcher.ainvoke(llm, messages)
         raw_json = extract_json_block(result.content)
-        repaired = repair_json(raw_json)
-        parsed_dict = json.loads(repaired)
-        
-        return parsed_dict.get("is_article", False), parsed_dict.get("reason", "No reason provided")
+        parsed_dict = json.loads(repair_json(raw_json))
+        entries = parsed_dict.get("results", [])
     except Exception as e:
-        logger.error(f"[LLM] URL validation error for {url}: {e}")
-        return True, f"Validation failed, defaulting to accept: {str(e)}"
+        logger.error(f"[LLM] Batch URL validation error for {len(items)} URLs: {e}")
+        entries = []
+
+    verdicts = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        # Models sometimes return the id as a string ("3")
+        try:
+            index = int(entry.get("id"))
+        except (TypeError, ValueError):
+            logger.warning(f"[LLM] URL validation returned an unusable id: {entry.get('id')!r}")
+            continue
+        if not 1 <= index <= len(items):
+            logger.warning(f"[LLM] URL validation returned an unknown id: {index}")
+            continue
+        verdicts[index] = entry
+
+    results = []
+    for index in range(1, len(items) + 1):
+        entry = verdicts.get(index)
+        if entry is None:
+            logger.warning(f"[LLM] URL validation returned no verdict for: {items[index - 1][0]}")
+            results.append(None)
+        else:
+            results.append(
+                (bool(entry.get("is_article", False)), entry.get("reason", "No reason provided"))
+            )
+    return results
@@ -0,0 +1,194 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from services.cache_db_service import cache_db
+
+METRICS_PREFIX = "llm_news"
+METRICS_RUN_HISTORY = int(os.getenv("METRICS_RUN_HISTORY", "200"))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# USD per million (input, output) tokens, matched by model name prefix
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "text-embedding-ada-002": (0.10, 0.0),
+    "text-embedding-3-small": (0.02, 0.0),
+}
+DEFAULT_MODEL = "gpt-4o-mini"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS run_summaries (
+    run_id TEXT PRIMARY KEY,
+    started_at REAL NOT NULL,
+    summary TEXT NOT NULL
+);
+"""
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_current_run = contextvars.ContextVar("metrics_run", default=None)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+def increment(name, value=1.0, **labels):
+    with _lock:
+        series = _counters.setdefault(name, {})
+        key = _label_key(labels)
+        series[key] = series.get(key, 0.0) + value
+
+
+def observe(name, value, **labels):
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        key = _label_key(labels)
+        entry = series.get(key)
+        if entry is None:
+            entry = series[key] = {"buckets": [0] * len(LATENCY_BUCKETS), "sum": 0.0, "count": 0}
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                entry["buckets"][index] += 1
+        entry["sum"] += value
+        entry["count"] += 1
+
+
+class RunStats:
+    """Totals for one report run, kept alongside the process-wide metrics."""
+
+    def __init__(self, run_id):
+        self.run_id = run_id
+        self.started_at = time.time()
+        self.stages = {}
+        self.tokens = {"prompt": 0, "completion": 0}
+        self.cost_usd = 0.0
+        self.caches = {}
+        self.summary = {}
+
+    def to_dict(self):
+        return {
+            "run_id": self.run_id,
+            "started_at": self.started_at,
+            "duration_seconds": round(time.time() - self.started_at, 3),
+            "stages": {
+                stage: {"count": count, "seconds": round(seconds, 3)}
+                for stage, (count, seconds) in self.stages.items()
+            },
+            "tokens": self.tokens,
+            "estimated_cost_usd": round(self.cost_usd, 6),
+            "cache_hit_rates": {
+                name: round(hits / (hits + misses), 3) if hits + misses else None
+                for name, (hits, misses) in self.caches.items()
+            },
+            **self.summary,
+        }
+
+
+def observe_stage(stage, seconds, **labels):
+    observe("stage_seconds", seconds, stage=stage, **labels)
+    run = _current_run.get()
+    if run is not None:
+        with _lock:
+            count, total = run.stages.get(stage, (0, 0.0))
+            run.stages[stage] = (count + 1, total + seconds)
+
+
+@contextmanager
+def timed(stage, **labels):
+    """Time a block as one observation of a pipeline stage."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started, **labels)
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    for prefix, (input_price, output_price) in MODEL_PRICES.items():
+        if model.startswith(prefix):
+            return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+    return 0.0
+
+
+def record_tokens(model, prompt_tokens, completion_tokens, price_factor=1.0):
+    model = model or DEFAULT_MODEL
+    cost = estimate_cost(model, prompt_tokens, completion_tokens) * price_factor
+    increment("tokens_total", prompt_tokens, model=model, kind="prompt")
+    increment("tokens_total", completion_tokens, model=model, kind="completion")
+    increment("estimated_cost_usd_total", cost, model=model)
+    run = _current_run.get()
+    if run is not None:
+        with _lock:
+            run.tokens["prompt"] += prompt_tokens
+            run.tokens["completion"] += completion_tokens
+            run.cost_usd += cost
+
+
+def record_cache(cache, hit):
+    increment("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+    run = _current_run.get()
+    if run is not None:
+        with _lock:
+            hits, misses = run.caches.get(cache, (0, 0))
+            run.caches[cache] = (hits + 1, misses) if hit else (hits, misses + 1)
+
+
+@contextmanager
+def track_run(run_id):
+    """Attribute metrics recorded in this context to a run and store its summary."""
+    run = RunStats(run_id)
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        _current_run.reset(token)
+        increment("runs_total")
+        with cache_db("metrics", _SCHEMA) as db:
+            db.execute(
+                "INSERT OR REPLACE INTO run_summaries (run_id, started_at, summary) VALUES (?, ?, ?)",
+                (run.run_id, run.started_at, json.dumps(run.to_dict())),
+            )
+            db.execute(
+                "DELETE FROM run_summaries WHERE run_id NOT IN ("
+                "SELECT run_id FROM run_summaries ORDER BY started_at DESC LIMIT ?)",
+                (METRICS_RUN_HISTORY,),
+            )
+
+
+def get_run_summaries(limit=20):
+    with cache_db("metrics", _SCHEMA) as db:
+        rows = db.execute(
+            "SELECT summary FROM run_summaries ORDER BY started_at DESC LIMIT ?", (limit,)
+        ).fetchall()
+    return [json.loads(row["summary"]) for row in rows]
+
+
+def render_prometheus():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        for name, series in sorted(_counters.items()):
+            metric = f"{METRICS_PREFIX}_{name}"
+            lines.append(f"# TYPE {metric} counter")
+            for key, value in sorted(series.items()):
+                lines.append(f"{metric}{_format_labels(key)} {value:g}")
+        for name, series in sorted(_histograms.items()):
+            metric = f"{METRICS_PREFIX}_{name}"
+            lines.append(f"# TYPE {metric} histogram")
+            for key, entry in sorted(series.items()):
+                for bound, count in zip(LATENCY_BUCKETS, entry["buckets"]):
+                    lines.append(f"{metric}_bucket{_format_labels(key, [('le', f'{bound:g}')])} {count}")
+                lines.append(f"{metric}_bucket{_format_labels(key, [('le', '+Inf')])} {entry['count']}")
+                lines.append(f"{metric}_sum{_format_labels(key)} {entry['sum']:g}")
+                lines.append(f"{metric}_count{_format_labels(key)} {entry['count']}")
+    return "\n".join(lines) + "\n"
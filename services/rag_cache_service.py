@@ -0,0 +1,143 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+RAG_QUERY_CACHE_SIZE = int(os.getenv("RAG_QUERY_CACHE_SIZE", "1024"))
+RAG_ANSWER_CACHE_ENABLED = os.getenv("RAG_ANSWER_CACHE_ENABLED", "true").lower() == "true"
+# Cosine similarity a new question needs with a cached one to reuse its answer
+RAG_ANSWER_CACHE_THRESHOLD = float(os.getenv("RAG_ANSWER_CACHE_THRESHOLD", "0.98"))
+RAG_ANSWER_CACHE_TTL = int(os.getenv("RAG_ANSWER_CACHE_TTL", "3600"))
+RAG_ANSWER_CACHE_SIZE = int(os.getenv("RAG_ANSWER_CACHE_SIZE", "256"))
+
+
+# Appended by the frontend when categories are selected
+_CATEGORY_FILTER = re.compile(r"\n\s*Tell me about these categories only:(.*)$", re.IGNORECASE)
+
+
+def normalize_question(question):
+    return " ".join(question.lower().split())
+
+
+def question_scope(question):
+    """The categories a question is restricted to, or None for no filter.
+
+    Embeddings barely move when only the filter changes, so answers are
+    only reused for questions with exactly the same categories.
+    """
+    match = _CATEGORY_FILTER.search(question)
+    if not match:
+        return None
+    categories = match.group(1).split(",")
+    return frozenset(normalize_question(category) for category in categories if category.strip())
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class QueryEmbeddingCache:
+    """LRU cache of question embeddings keyed by the normalized question."""
+
+    def __init__(self, size=RAG_QUERY_CACHE_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, question):
+        key = normalize_question(question)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+            return vector
+
+    def put(self, question, vector):
+        if self.size <= 0:
+            return
+        key = normalize_question(question)
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+
+class CachedAnswer:
+    def __init__(self, vector, index_version, top_k, scope, answer, sources):
+        self.vector = vector
+        self.index_version = index_version
+        self.top_k = top_k
+        self.scope = scope
+        self.answer = answer
+        self.sources = sources
+        self.created_at = time.time()
+
+
+class AnswerCache:
+    """Answers to earlier questions, reused for questions close enough in meaning.
+
+    Entries only match questions against the index version they were answered
+    from and with the same category filter, expire after a TTL and are
+    dropped whenever the index changes.
+    """
+
+    def __init__(
+        self,
+        threshold=RAG_ANSWER_CACHE_THRESHOLD,
+        ttl=RAG_ANSWER_CACHE_TTL,
+        size=RAG_ANSWER_CACHE_SIZE,
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.size = size
+        self._entries = []
+        self._lock = threading.Lock()
+
+    def _evict_expired(self):
+        cutoff = time.time() - self.ttl
+        self._entries = [entry for entry in self._entries if entry.created_at >= cutoff]
+
+    def lookup(self, vector, index_version, top_k, scope=None):
+        """Return (entry, similarity) of the closest cached answer, or (None, 0.0)."""
+        if not RAG_ANSWER_CACHE_ENABLED:
+            return None, 0.0
+        with self._lock:
+            self._evict_expired()
+            candidates = [
+                entry
+                for entry in self._entries
+                if entry.index_version == index_version
+                and entry.top_k == top_k
+                and entry.scope == scope
+            ]
+        if not candidates:
+            return None, 0.0
+        similarities = np.stack([entry.vector for entry in candidates]) @ _unit(vector)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None, float(similarities[best])
+        return candidates[best], float(similarities[best])
+
+    def store(self, vector, index_version, top_k, answer, sources, scope=None):
+        if not RAG_ANSWER_CACHE_ENABLED or not answer:
+            return
+        entry = CachedAnswer(_unit(vector), index_version, top_k, scope, answer, sources)
+        with self._lock:
+            self._entries.append(entry)
+            # Oldest first, so overflow drops the oldest answers
+            del self._entries[: max(0, len(self._entries) - self.size)]
+
+    def invalidate(self):
+        with self._lock:
+            removed = len(self._entries)
+            self._entries = []
+        return removed
+
+
+query_embeddings = QueryEmbeddingCache()
+answers = AnswerCache()
@@ -1,33 +1,280 @@
+import asyncio
 import os
 import faiss
+import hashlib
 import json
-from typing import List, Generator
-from langchain_community.vectorstores import FAISS
+import shutil
+import time
+from contextlib import aclosing
+from typing import AsyncGenerator, List
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
 from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_core.documents import Document
-from langchain.chains import RetrievalQA
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.prompts import PromptTemplate
-from services import json_logger_service
-from langchain.callbacks.base import BaseCallbackHandler
+from services import (
+    embedding_cache_service,
+    json_logger_service,
+    metrics_service,
+    rag_cache_service,
+    replay_service,
+    vector_index_service,
+)
+from services.vector_index_service import FAISS_METRIC
+from services.cache_db_service import CACHE_DIR
+from services.llm_dispatcher_service import dispatcher
 import threading
-import queue
 
-embedding_model = OpenAIEmbeddings(api_key=os.getenv("OPENAI_API_KEY"))
+embedding_model = OpenAIEmbeddings(
+    api_key=os.getenv("OPENAI_API_KEY"), **replay_service.openai_http_clients()
+)
+
+EMBEDDING_DIMENSION = 1536
+VECTORSTORE_DIR = CACHE_DIR / "vectorstore"
+# Older index versions kept on disk next to the current one
+VECTORSTORE_KEEP = int(os.getenv("VECTORSTORE_KEEP", "2"))
+# Number of most recent reports the index mirrors; older articles drop out
+RAG_INDEX_REPORTS = int(os.getenv("RAG_INDEX_REPORTS", "1"))
+# Bump when the on-disk layout changes, so older artifacts are rebuilt
+ARTIFACT_FORMAT = 2
 
 vectorstore = None
+# Sources the latest reports rejected, refreshed whenever they are indexed
+rejected_sources = frozenset()
+# Type of the index actually built; trained types start out flat
+built_index_type = "flat"
+# Increases with every indexing pass, stored with the artifact
+index_version = 0
+_save_lock = threading.Lock()
+# One indexing pass at a time; the report job and startup can both index
+_index_lock = threading.Lock()
+# Held while the vectorstore is replaced or changed and while it is searched,
+# so /rag never sees a half-built or half-updated index
+_vectorstore_lock = threading.Lock()
+
+
+def _new_vectorstore(training_vectors=None):
+    """An empty vectorstore and its index type, not yet made current.
+
+    Trained index types need the vectors they will hold; without enough of
+    them a flat index is used until the next rebuild.
+    """
+    vector_count = 0 if training_vectors is None else len(training_vectors)
+    index_type = vector_index_service.effective_type(vector_count)
+    faiss_index = vector_index_service.build_index(
+        EMBEDDING_DIMENSION, index_type, FAISS_METRIC, training_vectors
+    )
+    store = vector_index_service.create_vectorstore(
+        embedding_model, faiss_index, InMemoryDocstore(), {}, FAISS_METRIC
+    )
+    return store, index_type
 
 
 def initialize_vectorstore(logger=None):
-    global vectorstore
-    dimension = 1536
-    faiss_index = faiss.IndexFlatL2(dimension)
-    docstore = InMemoryDocstore()
-    index_to_docstore_id = {}
-    vectorstore = FAISS(embedding_model, faiss_index, docstore, index_to_docstore_id)
+    """Make an empty vectorstore of the configured index type and metric current."""
+    global vectorstore, built_index_type
+    store, index_type = _new_vectorstore()
+    with _vectorstore_lock:
+        vectorstore, built_index_type = store, index_type
     if logger:
-        logger.info("[RAG] Initialized empty vectorstore.")
+        logger.info(
+            f"[RAG] Initialized empty {built_index_type} vectorstore ({FAISS_METRIC})."
+        )
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_manifest(path):
+    try:
+        with open(path / "manifest.json", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _current_artifact():
+    """Directory and manifest of the current on-disk index, or (None, None)."""
+    try:
+        name = (VECTORSTORE_DIR / "CURRENT").read_text(encoding="utf-8").strip()
+    except OSError:
+        return None, None
+    path = VECTORSTORE_DIR / name
+    manifest = _read_manifest(path)
+    if manifest is None:
+        return None, None
+    return path, manifest
+
+
+def _prune_artifacts(current_name):
+    versions = sorted(
+        (
+            path
+            for path in VECTORSTORE_DIR.iterdir()
+            if path.is_dir() and path.name != current_name
+        ),
+        key=lambda path: path.name,
+        reverse=True,
+    )
+    for path in versions[VECTORSTORE_KEEP:]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def reports_sha256(report_files):
+    """Fingerprint of the reports an index was built from."""
+    if not report_files:
+        return None
+    digest = hashlib.sha256()
+    for path in report_files:
+        digest.update(f"{path.name}\x00{file_sha256(path)}\x00".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def save_vectorstore(report_files, source_sha256=None, logger=None):
+    """Write the index and docstore as a new artifact version and make it current.
+
+    Each version is written to its own directory and only then published
+    through the CURRENT pointer, so a crash mid-write leaves the previous
+    version in place.
+    """
+    global index_version
+    with _save_lock:
+        # Continue numbering after any stored version, even one that was stale
+        _, current = _current_artifact()
+        stored_version = current["index_version"] if current else 0
+        index_version = max(index_version, stored_version) + 1
+        name = f"v{index_version:06d}-{int(time.time())}"
+        path = VECTORSTORE_DIR / name
+        path.mkdir(parents=True, exist_ok=True)
+
+        faiss.write_index(vectorstore.index, str(path / "index.faiss"))
+        ids = [
+            vectorstore.index_to_docstore_id[i]
+            for i in range(len(vectorstore.index_to_docstore_id))
+        ]
+        documents = vectorstore.docstore._dict
+        with open(path / "docstore.json", "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "ids": ids,
+                    "documents": {
+                        doc_id: {
+                            "page_content": documents[doc_id].page_content,
+                            "metadata": documents[doc_id].metadata,
+                        }
+                        for doc_id in ids
+                    },
+                },
+                f,
+                ensure_ascii=False,
+            )
+        manifest = {
+            "format": ARTIFACT_FORMAT,
+            "index_version": index_version,
+            "created_at": time.time(),
+            "embedding_model": embedding_model.model,
+            "dimension": vectorstore.index.d,
+            "index_type": built_index_type,
+            "metric": FAISS_METRIC,
+            "chunks": vectorstore.index.ntotal,
+            "source_reports": [path.name for path in report_files],
+            "source_sha256": source_sha256 or reports_sha256(report_files),
+        }
+        with open(path / "manifest.json", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        pointer = VECTORSTORE_DIR / "CURRENT.tmp"
+        pointer.write_text(name, encoding="utf-8")
+        os.replace(pointer, VECTORSTORE_DIR / "CURRENT")
+        _prune_artifacts(name)
+        # Cached answers were generated from the previous index
+        rag_cache_service.answers.invalidate()
+    if logger:
+        logger.info(f"[RAG] Saved vectorstore version {index_version} ({manifest['chunks']} chunks).")
+    return manifest
+
+
+def load_vectorstore(logger=None):
+    """Load the current artifact into the global vectorstore.
+
+    Returns the manifest, or None when the artifact is missing, was built
+    with another format or embedding model, or is unreadable.
+    """
+    global vectorstore, index_version, built_index_type
+    path, manifest = _current_artifact()
+    if manifest is None:
+        return None
+    if (
+        manifest.get("format") != ARTIFACT_FORMAT
+        or manifest.get("embedding_model") != embedding_model.model
+        or manifest.get("metric") != FAISS_METRIC
+        or manifest.get("index_type")
+        != vector_index_service.effective_type(manifest.get("chunks", 0))
+    ):
+        if logger:
+            logger.info(f"[RAG] Stored vectorstore {path.name} is incompatible, rebuilding.")
+        return None
+    try:
+        index_path = str(path / "index.faiss")
+        faiss_index = None
+        if manifest["index_type"] in vector_index_service.MMAP_TYPES:
+            try:
+                # Memory-map the vectors so startup does not copy them into RAM
+                faiss_index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP)
+            except RuntimeError:
+                pass
+        if faiss_index is None:
+            faiss_index = faiss.read_index(index_path)
+        with open(path / "docstore.json", "r", encoding="utf-8") as f:
+            stored = json.load(f)
+    except (OSError, RuntimeError, ValueError) as e:
+        if logger:
+            logger.warning(f"[RAG] Could not load stored vectorstore {path.name}: {e}")
+        return None
+
+    docstore = InMemoryDocstore(
+        {
+            doc_id: Document(page_content=doc["page_content"], metadata=doc["metadata"])
+            for doc_id, doc in stored["documents"].items()
+        }
+    )
+    index_to_docstore_id = dict(enumerate(stored["ids"]))
+    vector_index_service.configure_search(faiss_index, manifest["index_type"])
+    loaded = vector_index_service.create_vectorstore(
+        embedding_model, faiss_index, docstore, index_to_docstore_id, FAISS_METRIC
+    )
+    with _vectorstore_lock:
+        vectorstore = loaded
+        built_index_type = manifest["index_type"]
+        index_version = manifest["index_version"]
+    rag_cache_service.answers.invalidate()
+    if logger:
+        logger.info(
+            f"[RAG] Loaded vectorstore version {index_version} ({manifest['chunks']} chunks) from {path}."
+        )
+    return manifest
+
+
+def load_or_build_vectorstore(logger=None):
+    """Load the stored index and bring it up to date with the latest reports.
+
+    When the stored index was built from the same reports it is used as is;
+    otherwise only the chunks that changed are embedded and upserted.
+    """
+    report_files = json_logger_service.get_recent_json_files(RAG_INDEX_REPORTS)
+    with metrics_service.timed("vectorstore_load"):
+        manifest = load_vectorstore(logger=logger)
+    if manifest and manifest.get("source_sha256") == reports_sha256(report_files):
+        refresh_rejected_sources(load_latest_entries(report_files))
+        return
+    if manifest is None:
+        initialize_vectorstore(logger=logger)
+    index_articles_from_json(logger=logger)
 
 
 def split_documents(docs: List[Document], logger=None) -> List[Document]:
@@ -38,24 +285,88 @@ def split_documents(docs: List[Document], logger=None) -> List[Document]:
     return chunks
 
 
+def load_latest_entries(report_files):
+    """Latest entry per source across the reports."""
+    latest = {}
+    for path in report_files:
+        with open(path, "r", encoding="utf-8") as f:
+            for entry in json.load(f):
+                source = entry.get("metadata", {}).get("source", "")
+                latest[source] = entry
+    return latest
+
+
+def _is_rejected(entry):
+    return entry.get("logging", {}).get("status", "") == "Rejected"
+
+
+def refresh_rejected_sources(latest_entries):
+    global rejected_sources
+    rejected_sources = frozenset(
+        source for source, entry in latest_entries.items() if _is_rejected(entry)
+    )
+
+
+def embed_chunks(chunks, logger=None):
+    """Vectors for a dict of chunk id -> text, embedding only uncached chunks."""
+    model = embedding_model.model
+    vectors = embedding_cache_service.get_embeddings(chunks, model)
+    for chunk in chunks:
+        metrics_service.record_cache("embeddings", chunk in vectors)
+    missing = [chunk for chunk in chunks if chunk not in vectors]
+    if missing:
+        texts = [chunks[chunk] for chunk in missing]
+        with metrics_service.timed("embedding"):
+            embedded = embedding_model.embed_documents(texts)
+        # Embeddings do not report usage; estimate about four characters per token
+        metrics_service.record_tokens(model, sum(len(text) for text in texts) // 4, 0)
+        embedded = dict(zip(missing, embedded))
+        embedding_cache_service.store_embeddings(embedded, model)
+        vectors.update(embedded)
+    if logger:
+        logger.info(
+            f"[RAG] Embedded {len(missing)} chunks, {len(chunks) - len(missing)} from cache."
+        )
+    return vectors
+
+
 def index_articles_from_json(logger=None):
-    latest_file = json_logger_service.get_latest_json_file()
-    if not latest_file:
+    """Upsert the chunks of the latest reports into the vectorstore.
+
+    Chunks are keyed by a hash of their source URL and text, so indexing the
+    same reports again changes nothing, and chunks of articles that were
+    removed or are now rejected are deleted. Blocking; async callers run it
+    in a thread.
+    """
+    with _index_lock:
+        _index_articles(logger)
+
+
+def _add_chunks(store, wanted, new, vectors):
+    if new:
+        store.add_embeddings(
+            [(wanted[chunk].page_content, vectors[chunk]) for chunk in new],
+            metadatas=[wanted[chunk].metadata for chunk in new],
+            ids=new,
+        )
+
+
+def _index_articles(logger=None):
+    global vectorstore, built_index_type
+    report_files = json_logger_service.get_recent_json_files(RAG_INDEX_REPORTS)
+    if not report_files:
         if logger:
             logger.warning("[RAG] No previous JSON report found.")
         return
 
     if logger:
-        logger.info(f"[RAG] Loading vectorstore from: {latest_file}")
-
-    with open(latest_file, "r", encoding="utf-8") as f:
-        all_articles = json.load(f)
+        logger.info(f"[RAG] Loading vectorstore from: {report_files[-1]}")
 
+    latest_entries = load_latest_entries(report_files)
+    refresh_rejected_sources(latest_entries)
     docs = []
-    for entry in all_articles:
-        # Only index articles that are not rejected
-        status = entry.get("logging", {}).get("status", "")
-        if status == "Rejected":
+    for entry in latest_entries.values():
+        if _is_rejected(entry):
             continue
         metadata = entry.get("metadata", {})
         content = metadata.get("raw_content", "") or metadata.get("content", "")
@@ -67,83 +378,64 @@ def index_articles_from_json(logger=None):
             )
             docs.append(doc)
 
-    if docs:
-        docs = split_documents(docs, logger=logger)
-        vectorstore.add_documents(docs)
-        if logger:
-            logger.info(f"[RAG] Indexed {len(docs)} chunks into vectorstore.")
-
-
-class TokenStreamHandler(BaseCallbackHandler):
-    def __init__(self):
-        self.queue = queue.Queue()
-        self.done = threading.Event()
-
-    def on_llm_new_token(self, token: str, **kwargs):
-        self.queue.put(token)
-
-    def on_llm_end(self, *args, **kwargs):
-        self.done.set()
-
-    def stream(self) -> Generator[str, None, None]:
-        while not self.done.is_set() or not self.queue.empty():
-            try:
-                token = self.queue.get(timeout=0.1)
-                yield token
-            except queue.Empty:
-                continue
-
-
-def stream_query_articles(
-    question: str, top_k: int = 5, logger=None
-) -> Generator[str, None, None]:
-    global vectorstore
-    retriever = vectorstore.as_retriever(search_kwargs={"k": top_k})
-    retrieved_docs = retriever.get_relevant_documents(question)
-
-    # Filter out docs whose source is from a rejected article
-    # (Assumes only non-rejected docs are indexed, but double check for safety)
-    filtered_docs = []
-    latest_file = json_logger_service.get_latest_json_file()
-    rejected_sources = set()
-    if latest_file:
-        with open(latest_file, "r", encoding="utf-8") as f:
-            all_articles = json.load(f)
-            for entry in all_articles:
-                status = entry.get("logging", {}).get("status", "")
-                if status == "Rejected":
-                    metadata = entry.get("metadata", {})
-                    source = metadata.get("source", "")
-                    rejected_sources.add(source)
-    for doc in retrieved_docs:
-        url = doc.metadata.get("source", "N/A")
-        if url not in rejected_sources:
-            filtered_docs.append(doc)
+    wanted = {}
+    for doc in split_documents(docs, logger=logger):
+        chunk = embedding_cache_service.chunk_id(doc.metadata["source"], doc.page_content)
+        wanted.setdefault(chunk, doc)
 
+    indexed = set(vectorstore.index_to_docstore_id.values())
+    stale = [chunk for chunk in indexed if chunk not in wanted]
+    new = [chunk for chunk in wanted if chunk not in indexed]
+    rebuild = vector_index_service.effective_type(len(wanted)) != built_index_type or (
+        stale and built_index_type not in vector_index_service.IN_PLACE_REMOVAL
+    )
+    if rebuild:
+        # Trained types are (re)trained on the whole corpus; the embedding
+        # cache makes this a lookup for chunks that were indexed before
+        new = list(wanted)
+    vectors = {}
+    if new:
+        vectors = embed_chunks({chunk: wanted[chunk].page_content for chunk in new}, logger)
+    with metrics_service.timed("indexing"):
+        if rebuild:
+            # Trained and filled on the side, then swapped in, so searches
+            # keep using the old index until the new one is complete
+            store, index_type = _new_vectorstore(
+                [vectors[chunk] for chunk in new] if new else None
+            )
+            _add_chunks(store, wanted, new, vectors)
+            with _vectorstore_lock:
+                vectorstore, built_index_type = store, index_type
+        else:
+            with _vectorstore_lock:
+                if stale:
+                    vectorstore.delete(stale)
+                _add_chunks(vectorstore, wanted, new, vectors)
     if logger:
         logger.info(
-            f"[RAG] Retrieved {len(filtered_docs)} non-rejected chunks for question: {question}"
+            f"[RAG] {'Rebuilt' if rebuild else 'Upserted'} {built_index_type} vectorstore: "
+            f"{len(new)} chunks added, {len(stale)} removed, {len(wanted)} total."
         )
-        retrieved_sources = set()
-        for i, doc in enumerate(filtered_docs, 1):
-            source = doc.metadata.get("source", "N/A")
-            title = doc.metadata.get("title", "N/A")
-            if source not in retrieved_sources:
-                logger.info(f"[RAG] Source: {source} | Title: {title}")
-                retrieved_sources.add(source)
 
-    # Collect unique sources (title and URL)
-    unique_sources = []
-    seen = set()
-    for doc in filtered_docs:
-        title = doc.metadata.get("title", "N/A")
-        url = doc.metadata.get("source", "N/A")
-        if url and url not in seen:
-            unique_sources.append((title, url))
-            seen.add(url)
-
-    custom_prompt = PromptTemplate.from_template(
-        """
+    source_sha256 = reports_sha256(report_files)
+    _, current = _current_artifact()
+    if stale or new or not current or current.get("source_sha256") != source_sha256:
+        with metrics_service.timed("vectorstore_save"):
+            save_vectorstore(report_files, source_sha256, logger=logger)
+    embedding_cache_service.evict(logger)
+
+
+rag_llm = ChatOpenAI(
+    model="gpt-4o-mini",
+    temperature=0.2,
+    api_key=os.getenv("OPENAI_API_KEY"),
+    stream_usage=True,
+    max_retries=0,
+    **replay_service.openai_http_clients(),
+)
+
+rag_prompt = PromptTemplate.from_template(
+    """
 You are an expert technology analyst specializing in emerging trends and innovations across all tech sectors.
 
 Your task is to analyze the provided context and answer the user's question with a comprehensive, well-structured response.
@@ -172,39 +464,109 @@ Your task is to analyze the provided context and answer the user's question with
 
 **Answer:**
 """
-    )
+)
 
-    handler = TokenStreamHandler()
-    streaming_llm = ChatOpenAI(
-        model="gpt-4o-mini",
-        temperature=0.2,
-        api_key=os.getenv("OPENAI_API_KEY"),
-        streaming=True,
-        callbacks=[handler],
-    )
 
-    qa_chain = RetrievalQA.from_chain_type(
-        llm=streaming_llm,
-        retriever=retriever,
-        return_source_documents=True,
-        chain_type_kwargs={"prompt": custom_prompt},
-    )
+async def embed_question(question: str) -> List[float]:
+    """Embedding of a question, reused for repeats of the same normalized question."""
+    query_vector = rag_cache_service.query_embeddings.get(question)
+    metrics_service.record_cache("query_embeddings", query_vector is not None)
+    if query_vector is None:
+        with metrics_service.timed("query_embedding"):
+            query_vector = await embedding_model.aembed_query(question)
+        metrics_service.record_tokens(embedding_model.model, len(question) // 4, 0)
+        rag_cache_service.query_embeddings.put(question, query_vector)
+    return query_vector
 
-    # Run in a thread so we can yield tokens as they arrive
-    def run_chain():
-        qa_chain.invoke({"query": question})
-        handler.done.set()
 
-    thread = threading.Thread(target=run_chain)
-    thread.start()
+async def retrieve_documents(
+    query_vector: List[float], top_k: int = 5
+) -> List[Document]:
+    """Run a single search over the vectorstore."""
+    with metrics_service.timed("retrieval"):
+        return await asyncio.to_thread(_search, query_vector, top_k)
 
-    for token in handler.stream():
-        yield token
 
-    thread.join()
+def _search(query_vector, top_k):
+    with _vectorstore_lock:
+        return vectorstore.similarity_search_by_vector(query_vector, k=top_k)
 
-    # After the answer, yield the sources as markdown
+
+def format_sources(unique_sources):
+    """The (title, URL) sources as a markdown list to follow the answer."""
     if unique_sources:
         yield "\n\n---\n**Sources:**\n"
-        for i, (title, url) in enumerate(unique_sources, 1):
+        for title, url in unique_sources:
             yield f"- [{title}]({url})\n"
+
+
+async def stream_query_articles(
+    question: str, top_k: int = 5, logger=None
+) -> AsyncGenerator[str, None]:
+    query_vector = await embed_question(question)
+    answered_version = index_version
+    scope = rag_cache_service.question_scope(question)
+
+    cached, similarity = rag_cache_service.answers.lookup(
+        query_vector, answered_version, top_k, scope
+    )
+    metrics_service.record_cache("rag_answers", cached is not None)
+    if cached:
+        if logger:
+            logger.info(
+                f"[RAG] Reusing cached answer (similarity {similarity:.3f}) for question: {question}"
+            )
+        yield cached.answer
+        for line in format_sources(cached.sources):
+            yield line
+        return
+
+    retrieved_docs = await retrieve_documents(query_vector, top_k)
+
+    # Rejected articles are not indexed, but the latest report may have
+    # rejected a source after its chunks were retrieved from an older index
+    filtered_docs = [
+        doc
+        for doc in retrieved_docs
+        if doc.metadata.get("source", "N/A") not in rejected_sources
+    ]
+
+    if logger:
+        logger.info(
+            f"[RAG] Retrieved {len(filtered_docs)} non-rejected chunks for question: {question}"
+        )
+        retrieved_sources = set()
+        for i, doc in enumerate(filtered_docs, 1):
+            source = doc.metadata.get("source", "N/A")
+            title = doc.metadata.get("title", "N/A")
+            if source not in retrieved_sources:
+                logger.info(f"[RAG] Source: {source} | Title: {title}")
+                retrieved_sources.add(source)
+
+    # Collect unique sources (title and URL)
+    unique_sources = []
+    seen = set()
+    for doc in filtered_docs:
+        title = doc.metadata.get("title", "N/A")
+        url = doc.metadata.get("source", "N/A")
+        if url and url not in seen:
+            unique_sources.append((title, url))
+            seen.add(url)
+
+    context = "\n\n".join(doc.page_content for doc in filtered_docs)
+    messages = [
+        {"role": "user", "content": rag_prompt.format(context=context, question=question)}
+    ]
+    answer = []
+    async with aclosing(dispatcher.astream(rag_llm, messages)) as stream:
+        async for chunk in stream:
+            if chunk.content:
+                answer.append(chunk.content)
+                yield chunk.content
+    # Only answers that streamed to the end are cached
+    rag_cache_service.answers.store(
+        query_vector, answered_version, top_k, "".join(answer), unique_sources, scope
+    )
+
+    for line in format_sources(unique_sources):
+        yield line
@@ -0,0 +1,29 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Async token bucket: refills at `rate` tokens per second up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, tokens=1):
+        # Requests larger than the bucket would never fit, so let them drain it
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
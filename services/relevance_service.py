@@ -0,0 +1,82 @@
+import json
+import math
+import os
+import re
+import zlib
+from functools import lru_cache
+import numpy as np
+
+CATEGORIES_FILE = os.path.join(os.path.dirname(__file__), "../categories.json")
+# 0 disables the prefilter; calibrate with benchmarks.relevance_calibration
+RELEVANCE_THRESHOLD = float(os.getenv("RELEVANCE_THRESHOLD", "0"))
+HASH_BUCKETS = 2**18
+PREFILTER_REASON_PREFIX = "Rejected (prefilter)"
+
+_WORD = re.compile(r"[a-z0-9]+")
+_CAMEL_CASE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+
+def _features(words):
+    """Unigram and bigram hashes for a list of lowercase words."""
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return np.fromiter(
+        (zlib.crc32(gram.encode("utf-8")) % HASH_BUCKETS for gram in grams),
+        dtype=np.int64,
+        count=len(grams),
+    )
+
+
+def _category_words(name):
+    # "FinTech" also matches "fin tech", "Industrial IoT (IIoT)" also matches "iiot"
+    words = _WORD.findall(name.lower())
+    parts = [part.lower() for part in _CAMEL_CASE.findall(name)]
+    return words, parts
+
+
+@lru_cache(maxsize=None)
+def load_profile(categories_file=CATEGORIES_FILE):
+    """IDF-weighted hashed n-gram profile of every category name.
+
+    Terms shared by many categories ("tech", "data") weigh less than
+    distinctive ones ("blockchain", "genomics").
+    """
+    with open(categories_file, "r") as f:
+        categories = json.load(f)["categories"]
+    category_features = []
+    for name in categories:
+        words, parts = _category_words(name)
+        category_features.append(
+            np.unique(np.concatenate([_features(words), _features(parts)]))
+        )
+    document_frequency = np.bincount(
+        np.concatenate(category_features), minlength=HASH_BUCKETS
+    )
+    idf = np.zeros(HASH_BUCKETS, dtype=np.float32)
+    present = document_frequency > 0
+    idf[present] = np.log((1 + len(categories)) / (1 + document_frequency[present])) + 1
+    return idf
+
+
+def relevance_score(content, title="", profile=None):
+    """Score text against the category profile.
+
+    The article's sublinear term frequencies are dotted with the profile and
+    divided by their norm, so long pages are not favoured over short ones.
+    """
+    profile = load_profile() if profile is None else profile
+    words = _WORD.findall(f"{title}\n{content}".lower())
+    if not words:
+        return 0.0
+    counts = np.bincount(_features(words), minlength=HASH_BUCKETS)
+    present = counts > 0
+    tf = 1 + np.log(counts[present])
+    return float(tf @ profile[present] / math.sqrt(tf @ tf))
+
+
+def prefilter(article, threshold=None):
+    """Return (passes, score) for an article's content and title."""
+    threshold = RELEVANCE_THRESHOLD if threshold is None else threshold
+    if threshold <= 0:
+        return True, None
+    score = relevance_score(article.get("content", ""), article.get("title", ""))
+    return score >= threshold, score
@@ -0,0 +1,200 @@
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import httpx
+
+# "record" saves every HTTP response (pages, APIs, chat completions, embeddings)
+# as a fixture, "replay" serves them from the fixtures without network access
+REPLAY_MODE = os.getenv("REPLAY_MODE", "off").lower()
+REPLAY_DIR = Path(
+    os.getenv("REPLAY_DIR", Path(__file__).resolve().parent.parent / "benchmarks" / "fixtures")
+)
+# Seconds added to every replayed response, to mimic network and model latency
+REPLAY_LATENCY = float(os.getenv("REPLAY_LATENCY", "0"))
+REPLAY_LLM_LATENCY = float(os.getenv("REPLAY_LLM_LATENCY", str(REPLAY_LATENCY)))
+
+# Credentials are left out of fixture keys and files
+_SECRET_PARAMS = {"key", "api_key", "apikey", "access_token", "token"}
+# The body is stored decoded, so these no longer describe it
+_DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "set-cookie"}
+_LLM_HOSTS = {"api.openai.com"}
+
+
+def is_enabled():
+    return REPLAY_MODE in ("record", "replay")
+
+
+def _redact_url(url):
+    parts = urlsplit(str(url))
+    query = urlencode(
+        [
+            (name, value)
+            for name, value in parse_qsl(parts.query, keep_blank_values=True)
+            if name.lower() not in _SECRET_PARAMS
+        ]
+    )
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, query, ""))
+
+
+def fixture_key(kind, *parts):
+    digest = hashlib.sha256("\x00".join([kind, *parts]).encode("utf-8")).hexdigest()
+    return f"{kind}/{digest[:32]}"
+
+
+def _fixture_path(key):
+    return REPLAY_DIR / f"{key}.json"
+
+
+def load_fixture(key):
+    path = _fixture_path(key)
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_fixture(key, fixture):
+    path = _fixture_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(fixture, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def _request_key(request):
+    url = _redact_url(request.url)
+    kind = "llm" if request.url.host in _LLM_HOSTS else "http"
+    body = request.content.decode("utf-8", errors="replace") if request.content else ""
+    return fixture_key(kind, request.method, url, body)
+
+
+def _to_fixture(request, response, body):
+    try:
+        encoded = {"text": body.decode("utf-8")}
+    except UnicodeDecodeError:
+        encoded = {"base64": base64.b64encode(body).decode("ascii")}
+    return {
+        "request": {"method": request.method, "url": _redact_url(request.url)},
+        "response": {
+            "status_code": response.status_code,
+            "headers": [
+                [name, value]
+                for name, value in response.headers.multi_items()
+                if name.lower() not in _DROPPED_HEADERS
+            ],
+            **encoded,
+        },
+    }
+
+
+def _from_fixture(request, fixture):
+    stored = fixture["response"]
+    if "text" in stored:
+        body = stored["text"].encode("utf-8")
+    else:
+        body = base64.b64decode(stored["base64"])
+    return httpx.Response(
+        stored["status_code"], headers=stored["headers"], content=body, request=request
+    )
+
+
+def _latency(request):
+    return REPLAY_LLM_LATENCY if request.url.host in _LLM_HOSTS else REPLAY_LATENCY
+
+
+def _missing(request):
+    return httpx.ConnectError(
+        f"No recorded response for {request.method} {_redact_url(request.url)}",
+        request=request,
+    )
+
+
+class ReplayTransport(httpx.AsyncBaseTransport, httpx.BaseTransport):
+    """httpx transport that records responses to fixtures or replays them.
+
+    Requests are keyed by method, URL (without credentials) and body, so the
+    same page, API call, chat completion or embedding request always maps to
+    the same fixture. Streamed responses are stored whole and replayed as one
+    body.
+    """
+
+    def __init__(self, mode=REPLAY_MODE, async_transport=None, sync_transport=None):
+        self.mode = mode
+        self.async_transport = async_transport
+        self.sync_transport = sync_transport
+
+    async def handle_async_request(self, request):
+        key = _request_key(request)
+        if self.mode == "replay":
+            fixture = await asyncio.to_thread(load_fixture, key)
+            if fixture is None:
+                raise _missing(request)
+            await asyncio.sleep(_latency(request))
+            return _from_fixture(request, fixture)
+        response = await self.async_transport.handle_async_request(request)
+        fixture = _to_fixture(request, response, await response.aread())
+        await asyncio.to_thread(save_fixture, key, fixture)
+        return _from_fixture(request, fixture)
+
+    def handle_request(self, request):
+        key = _request_key(request)
+        if self.mode == "replay":
+            fixture = load_fixture(key)
+            if fixture is None:
+                raise _missing(request)
+            time.sleep(_latency(request))
+            return _from_fixture(request, fixture)
+        response = self.sync_transport.handle_request(request)
+        fixture = _to_fixture(request, response, response.read())
+        save_fixture(key, fixture)
+        return _from_fixture(request, fixture)
+
+    async def aclose(self):
+        if self.async_transport is not None:
+            await self.async_transport.aclose()
+
+    def close(self):
+        if self.sync_transport is not None:
+            self.sync_transport.close()
+
+
+def wrap_async_transport(transport):
+    """Wrap a transport for the shared HTTP client, or return it unchanged when off."""
+    if not is_enabled():
+        return transport
+    return ReplayTransport(async_transport=transport)
+
+
+def openai_http_clients():
+    """Keyword arguments that route an OpenAI or LangChain client through the replay layer."""
+    if not is_enabled():
+        return {}
+    return {
+        "http_client": httpx.Client(
+            transport=ReplayTransport(sync_transport=httpx.HTTPTransport())
+        ),
+        "http_async_client": httpx.AsyncClient(
+            transport=ReplayTransport(async_transport=httpx.AsyncHTTPTransport())
+        ),
+    }
+
+
+def record_value(kind, name, value):
+    """Record a non-HTTP result (e.g. a browser scrape) when recording."""
+    if REPLAY_MODE == "record":
+        save_fixture(fixture_key(kind, name), {"name": name, "value": value})
+
+
+def replay_value(kind, name):
+    """Return (found, value) for a recorded non-HTTP result."""
+    fixture = load_fixture(fixture_key(kind, name))
+    if fixture is None:
+        return False, None
+    time.sleep(REPLAY_LATENCY)
+    return True, fixture["value"]
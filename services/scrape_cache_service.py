@@ -0,0 +1,108 @@
+import os
+import time
+from services.cache_db_service import cache_db
+from services.url_service import canonicalize_url
+
+SCRAPE_CACHE_TTL = int(os.getenv("SCRAPE_CACHE_TTL", str(24 * 3600)))
+SCRAPE_CACHE_MAX_AGE = int(os.getenv("SCRAPE_CACHE_MAX_AGE", str(30 * 24 * 3600)))
+SCRAPE_CACHE_MAX_BYTES = int(os.getenv("SCRAPE_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+EVICT_EVERY = 50
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scrape_cache (
+    url TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    method TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scrape_cache_fetched_at ON scrape_cache (fetched_at);
+"""
+
+_stores_since_evict = 0
+
+
+def cache_key(url):
+    return canonicalize_url(url)
+
+
+def get_entry(url):
+    with cache_db("scrape_cache", _SCHEMA) as db:
+        row = db.execute(
+            "SELECT * FROM scrape_cache WHERE url = ?", (cache_key(url),)
+        ).fetchone()
+    if row is None:
+        return None
+    entry = dict(row)
+    if time.time() - entry["fetched_at"] > SCRAPE_CACHE_MAX_AGE:
+        return None
+    return entry
+
+
+def is_fresh(entry):
+    return time.time() - entry["fetched_at"] <= SCRAPE_CACHE_TTL
+
+
+def conditional_headers(entry):
+    headers = {}
+    if entry and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry and entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def store(url, method, content, etag=None, last_modified=None):
+    global _stores_since_evict
+    with cache_db("scrape_cache", _SCHEMA) as db:
+        db.execute(
+            "INSERT OR REPLACE INTO scrape_cache "
+            "(url, content, method, etag, last_modified, fetched_at, size) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                cache_key(url),
+                content,
+                method,
+                etag,
+                last_modified,
+                time.time(),
+                len(content.encode("utf-8")),
+            ),
+        )
+    _stores_since_evict += 1
+    if _stores_since_evict >= EVICT_EVERY:
+        _stores_since_evict = 0
+        evict()
+
+
+def mark_revalidated(url):
+    with cache_db("scrape_cache", _SCHEMA) as db:
+        db.execute(
+            "UPDATE scrape_cache SET fetched_at = ? WHERE url = ?",
+            (time.time(), cache_key(url)),
+        )
+
+
+def evict(logger=None):
+    with cache_db("scrape_cache", _SCHEMA) as db:
+        expired = db.execute(
+            "DELETE FROM scrape_cache WHERE fetched_at < ?",
+            (time.time() - SCRAPE_CACHE_MAX_AGE,),
+        ).rowcount
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM scrape_cache").fetchone()[0]
+        evicted = 0
+        if total > SCRAPE_CACHE_MAX_BYTES:
+            for row in db.execute(
+                "SELECT url, size FROM scrape_cache ORDER BY fetched_at"
+            ).fetchall():
+                if total <= SCRAPE_CACHE_MAX_BYTES:
+                    break
+                db.execute("DELETE FROM scrape_cache WHERE url = ?", (row["url"],))
+                total -= row["size"]
+                evicted += 1
+    if logger and (expired or evicted):
+        logger.info(
+            f"[Scrape Cache] Evicted {expired} expired and {evicted} oversized entries."
+        )
@@ -0,0 +1,68 @@
+from functools import lru_cache
+import tiktoken
+
+CONTENT_PREFIX = "Article Content:\n"
+# Only cut back to a paragraph edge when it keeps most of the budget
+PARAGRAPH_EDGE_MIN_RATIO = 0.9
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model):
+    return tiktoken.encoding_for_model(model)
+
+
+def encode(text, model):
+    # Scraped pages can contain strings like "<|endoftext|>"; treat them as text
+    return get_encoding(model).encode(text, disallowed_special=())
+
+
+@lru_cache(maxsize=32)
+def count_prompt_tokens(prompt, model):
+    return len(encode(prompt, model))
+
+
+def fit_to_budget(content, system_prompt, max_input_tokens, model):
+    """Truncate content so the prompt plus content fits in max_input_tokens.
+
+    The content is encoded once and cut at an exact token boundary, moved back
+    to the last paragraph break when one is close. Returns the (possibly
+    truncated) content and the total input token count.
+    """
+    fixed_tokens = count_prompt_tokens(system_prompt, model) + count_prompt_tokens(
+        CONTENT_PREFIX, model
+    )
+    tokens = encode(content, model)
+    if fixed_tokens + len(tokens) <= max_input_tokens:
+        return content, fixed_tokens + len(tokens)
+
+    budget = max(max_input_tokens - fixed_tokens, 0)
+    truncated = get_encoding(model).decode(tokens[:budget])
+    paragraph_edge = truncated.rfind("\n")
+    if paragraph_edge >= len(truncated) * PARAGRAPH_EDGE_MIN_RATIO:
+        truncated = truncated[:paragraph_edge]
+    return truncated, fixed_tokens + len(encode(truncated, model))
+
+
+def split_into_chunks(content, chunk_tokens, model):
+    """Split content into pieces of at most chunk_tokens tokens.
+
+    The content is encoded once and every cut lands on a token boundary, moved
+    back to just after a line break when one is close.
+    """
+    encoding = get_encoding(model)
+    tokens = encode(content, model)
+    chunks = []
+    start = 0
+    while start < len(tokens):
+        end = min(start + chunk_tokens, len(tokens))
+        if end < len(tokens):
+            earliest = start + int(chunk_tokens * PARAGRAPH_EDGE_MIN_RATIO)
+            for index in range(end - 1, earliest - 1, -1):
+                if b"\n" in encoding.decode_single_token_bytes(tokens[index]):
+                    end = index + 1
+                    break
+        piece = encoding.decode(tokens[start:end])
+        if piece.strip():
+            chunks.append(piece)
+        start = end
+    return chunks
@@ -0,0 +1,138 @@
+import asyncio
+import os
+import re
+import time
+from urllib.parse import urlsplit
+from services import metrics_service
+from services.cache_db_service import cache_db
+from services.llm_service import validate_article_urls
+from services.url_service import canonicalize_url
+
+URL_CLASSIFIER_BATCH_SIZE = int(os.getenv("URL_CLASSIFIER_BATCH_SIZE", "20"))
+
+SECTION_SEGMENTS = {
+    "news", "technology", "tech", "science", "business", "latest", "blog", "blogs",
+    "articles", "stories", "topics", "topic", "section", "sections", "category",
+    "categories", "tag", "tags", "archive", "archives", "author", "authors",
+    "search", "video", "videos", "home", "index", "en", "us", "world",
+}
+LISTING_PARENTS = {"category", "categories", "tag", "tags", "topic", "topics", "section", "author", "authors", "page"}
+
+_DATE_PART = re.compile(r"^\d{1,4}$")
+_SLUG_WORD = re.compile(r"[a-z0-9]+")
+_FILE_SUFFIX = re.compile(r"\.(html?|php|aspx?)$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS url_verdicts (
+    url TEXT PRIMARY KEY,
+    is_article INTEGER NOT NULL,
+    reason TEXT NOT NULL,
+    decided_by TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+def prefilter_url(url):
+    """Decide obvious cases from the URL path alone.
+
+    Returns (is_article, reason), or None when the LLM has to decide.
+    """
+    path = urlsplit(url).path.lower()
+    segments = [segment for segment in path.split("/") if segment]
+
+    if not segments:
+        return False, "Prefilter: site root"
+    leading = list(segments)
+    while leading and _DATE_PART.match(leading[-1]):
+        leading.pop()
+    if len(leading) < len(segments) and all(segment in SECTION_SEGMENTS for segment in leading):
+        return False, "Prefilter: date archive page"
+    if len(segments) >= 2 and segments[-2] in LISTING_PARENTS:
+        return False, f"Prefilter: /{segments[-2]}/ listing page"
+    if all(segment in SECTION_SEGMENTS for segment in segments):
+        return False, "Prefilter: section index page"
+
+    slug = _FILE_SUFFIX.sub("", segments[-1])
+    slug_words = _SLUG_WORD.findall(slug)
+    has_date = any(
+        _DATE_PART.match(segment) and len(segment) == 4 for segment in segments[:-1]
+    )
+    if "-" in slug and len(slug_words) >= (3 if has_date else 5):
+        return True, "Prefilter: descriptive article slug"
+    return None
+
+
+def _load_verdicts(keys):
+    with cache_db("url_verdicts", _SCHEMA) as db:
+        rows = [
+            db.execute(
+                "SELECT url, is_article, reason FROM url_verdicts WHERE url = ?", (key,)
+            ).fetchone()
+            for key in keys
+        ]
+    return {row["url"]: (bool(row["is_article"]), row["reason"]) for row in rows if row}
+
+
+def _store_verdicts(verdicts, decided_by):
+    now = time.time()
+    with cache_db("url_verdicts", _SCHEMA) as db:
+        db.executemany(
+            "INSERT OR REPLACE INTO url_verdicts (url, is_article, reason, decided_by, created_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [
+                (key, int(is_article), reason, decided_by, now)
+                for key, (is_article, reason) in verdicts.items()
+            ],
+        )
+
+
+async def classify_urls(logger, items):
+    """Return an (is_article, reason) verdict for every (url, title) pair.
+
+    Verdicts come from the persistent cache, then the URL prefilter, and only
+    the remaining pairs are sent to the LLM in batches.
+    """
+    keys = [canonicalize_url(url) for url, _ in items]
+    verdicts = _load_verdicts(set(keys))
+    cache_hits = sum(1 for key in keys if key in verdicts)
+    for key in keys:
+        metrics_service.record_cache("url_verdicts", key in verdicts)
+
+    prefiltered = {}
+    undecided = {}
+    for key, (url, title) in zip(keys, items):
+        if key in verdicts or key in prefiltered or key in undecided:
+            continue
+        verdict = prefilter_url(url)
+        if verdict is None:
+            undecided[key] = (key, url, title)
+        else:
+            prefiltered[key] = verdict
+    _store_verdicts(prefiltered, "prefilter")
+    verdicts.update(prefiltered)
+
+    undecided = list(undecided.values())
+    batches = [
+        undecided[start : start + URL_CLASSIFIER_BATCH_SIZE]
+        for start in range(0, len(undecided), URL_CLASSIFIER_BATCH_SIZE)
+    ]
+    batch_results = await asyncio.gather(
+        *(validate_article_urls([(url, title) for _, url, title in batch]) for batch in batches)
+    )
+    classified = {}
+    for batch, results in zip(batches, batch_results):
+        for (key, _, _), verdict in zip(batch, results):
+            if verdict is not None:
+                classified[key] = verdict
+    _store_verdicts(classified, "llm")
+    verdicts.update(classified)
+
+    logger.info(
+        f"[URL Classifier] {len(items)} URLs: {cache_hits} cached, {len(prefiltered)} prefiltered, "
+        f"{len(undecided)} sent to the LLM in {len(batches)} batches."
+    )
+    return [
+        verdicts.get(key, (True, "Validation failed, defaulting to accept"))
+        for key in keys
+    ]
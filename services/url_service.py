@@ -0,0 +1,167 @@
+import asyncio
+import os
+import re
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from services import http_client_service
+from services.cache_db_service import cache_db
+
+URL_RESOLVE_REDIRECTS = os.getenv("URL_RESOLVE_REDIRECTS", "false").lower() == "true"
+REDIRECT_CACHE_TTL = int(os.getenv("REDIRECT_CACHE_TTL", str(30 * 24 * 3600)))
+
+# Only parameters that never select content; generic names such as "ref"
+# (a branch on GitHub) are kept
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "igshid", "yclid",
+    "ref_src", "cmpid", "ocid", "_ga", "guccounter", "smid", "sr_share",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "mtm_", "hsa_", "__hs")
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+_AMP_CACHE_HOST = re.compile(r"\.cdn\.ampproject\.org$")
+_AMP_PATH_PREFIX = re.compile(r"^/amp(?=/)")
+_AMP_PATH_SUFFIX = re.compile(r"(/amp|\.amp)$")
+# Second-level labels of two-part public suffixes such as co.uk or com.au
+_SECOND_LEVEL_LABELS = {"ac", "co", "com", "edu", "gov", "net", "org"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS redirects (
+    url TEXT PRIMARY KEY,
+    final_url TEXT NOT NULL,
+    resolved_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS seen_urls (
+    url TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    seen_at REAL NOT NULL,
+    PRIMARY KEY (url, run_id)
+) WITHOUT ROWID;
+"""
+
+
+def _is_tracking_param(name):
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def _has_registrable_domain(host):
+    """Whether a host still names a site, e.g. example.com but not dev or co.uk."""
+    labels = host.split(".")
+    if len(labels) < 2:
+        return False
+    if len(labels) == 2 and labels[0] in _SECOND_LEVEL_LABELS and len(labels[1]) == 2:
+        return False
+    return True
+
+
+def canonicalize_url(url):
+    """Normalize a URL so tracking, www., AMP and slash variants compare equal."""
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        # Malformed, e.g. a port above 65535 or an unclosed IPv6 bracket
+        return url
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    path = parts.path
+
+    # https://www-example-com.cdn.ampproject.org/c/s/www.example.com/article
+    if _AMP_CACHE_HOST.search(host):
+        segments = [segment for segment in path.split("/") if segment]
+        while segments and segments[0] in ("c", "v", "s", "i"):
+            segments.pop(0)
+        if segments:
+            host = segments[0].lower()
+            path = "/" + "/".join(segments[1:])
+            scheme = "https"
+
+    if host.startswith("www."):
+        host = host[4:]
+    if host.startswith("amp.") and _has_registrable_domain(host[4:]):
+        host = host[4:]
+    if port and DEFAULT_PORTS.get(scheme) != str(port):
+        host = f"{host}:{port}"
+
+    path = re.sub(r"/{2,}", "/", path)
+    # Only a leading or trailing /amp segment marks the AMP variant
+    path = _AMP_PATH_PREFIX.sub("", path).replace(".amp.html", ".html")
+    path = _AMP_PATH_SUFFIX.sub("", path.rstrip("/"))
+    path = path or "/"
+
+    query = urlencode(
+        sorted(
+            (name, value)
+            for name, value in parse_qsl(parts.query, keep_blank_values=True)
+            if not _is_tracking_param(name)
+        )
+    )
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def _cached_redirect(url):
+    with cache_db("urls", _SCHEMA) as db:
+        row = db.execute(
+            "SELECT final_url, resolved_at FROM redirects WHERE url = ?", (url,)
+        ).fetchone()
+    if row and time.time() - row["resolved_at"] <= REDIRECT_CACHE_TTL:
+        return row["final_url"]
+    return None
+
+
+async def resolve_redirects(logger, url):
+    """Follow redirects with a HEAD request, caching the final URL."""
+    cached = _cached_redirect(url)
+    if cached:
+        return cached
+    try:
+        response = await http_client_service.request(
+            "HEAD", url, logger=logger, follow_redirects=True
+        )
+        final_url = str(response.url)
+    except Exception as e:
+        logger.warning(f"[URL] Could not resolve redirects for {url}: {e}")
+        return url
+    with cache_db("urls", _SCHEMA) as db:
+        db.execute(
+            "INSERT OR REPLACE INTO redirects (url, final_url, resolved_at) VALUES (?, ?, ?)",
+            (url, final_url, time.time()),
+        )
+    return final_url
+
+
+async def canonicalize_articles(logger, articles, resolve=URL_RESOLVE_REDIRECTS):
+    """Set 'canonical_url' on every article, optionally after resolving redirects."""
+    if resolve:
+        final_urls = await asyncio.gather(
+            *(resolve_redirects(logger, article["url"]) for article in articles)
+        )
+    else:
+        final_urls = [article["url"] for article in articles]
+    for article, final_url in zip(articles, final_urls):
+        article["canonical_url"] = canonicalize_url(final_url)
+    return articles
+
+
+def get_previous_runs(urls, run_id):
+    """Map each canonical URL seen in an earlier run to the latest such run id."""
+    previous = {}
+    with cache_db("urls", _SCHEMA) as db:
+        for url in set(urls):
+            row = db.execute(
+                "SELECT run_id FROM seen_urls WHERE url = ? AND run_id != ? "
+                "ORDER BY seen_at DESC LIMIT 1",
+                (url, run_id),
+            ).fetchone()
+            if row:
+                previous[url] = row["run_id"]
+    return previous
+
+
+def record_seen(urls, run_id):
+    now = time.time()
+    with cache_db("urls", _SCHEMA) as db:
+        db.executemany(
+            "INSERT OR REPLACE INTO seen_urls (url, run_id, seen_at) VALUES (?, ?, ?)",
+            [(url, run_id, now) for url in urls],
+        )
@@ -0,0 +1,23 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+import pytest
+
+# Settings are read at import time, so they must be in place before the
+# services are imported
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="llm-news-tests-"))
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """Point the sqlite caches at an empty directory for one test."""
+    from services import cache_db_service
+
+    cache_db_service.close_all()
+    monkeypatch.setattr(cache_db_service, "CACHE_DIR", tmp_path)
+    yield tmp_path
+    cache_db_service.close_all()
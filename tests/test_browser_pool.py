@@ -0,0 +1,67 @@
+import logging
+import pytest
+from selenium.common.exceptions import InvalidSessionIdException, WebDriverException
+from services import browser_pool_service
+from services.browser_pool_service import BrowserPool
+
+logger = logging.getLogger("tests")
+
+
+class FakeSwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def new_window(self, kind):
+        pass
+
+    def window(self, handle):
+        if not self.driver.alive:
+            raise self.driver.error
+
+
+class FakeDriver:
+    current_window_handle = "base"
+
+    def __init__(self, error, alive):
+        self.error = error
+        self.alive = alive
+        self.switch_to = FakeSwitchTo(self)
+        self.quit_calls = 0
+
+    @property
+    def current_url(self):
+        if not self.alive:
+            raise self.error
+        return "about:blank"
+
+    def get(self, url):
+        raise self.error
+
+    def close(self):
+        pass
+
+    def quit(self):
+        self.quit_calls += 1
+
+
+@pytest.mark.parametrize(
+    "error, alive",
+    [
+        (WebDriverException("unknown error: net::ERR_NAME_NOT_RESOLVED"), True),
+        (InvalidSessionIdException("invalid session id"), False),
+        # A crashed chromedriver answers with connection errors, not WebDriverException
+        (ConnectionRefusedError(111, "Connection refused"), False),
+        (RuntimeError("unexpected"), True),
+    ],
+)
+def test_only_dead_sessions_are_recycled(monkeypatch, error, alive):
+    monkeypatch.setattr(browser_pool_service, "detect_chrome_version", lambda logger: "137.0.0.0")
+    driver = FakeDriver(error, alive)
+    pool = BrowserPool(logger, size=1)
+    monkeypatch.setattr(pool, "_launch", lambda: browser_pool_service._PooledBrowser(driver))
+
+    with pytest.raises(type(error)):
+        pool.fetch_paragraphs("http://unresolvable.invalid")
+
+    assert driver.quit_calls == (0 if alive else 1)
+    assert len(pool._idle) == (1 if alive else 0)
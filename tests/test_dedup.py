@@ -0,0 +1,53 @@
+import asyncio
+import logging
+import numpy as np
+import pytest
+from controllers import report_controller
+from services import dedup_service
+from services.dedup_service import NearDuplicateIndex, minhash_signature
+
+CONTENT = " ".join(f"word{i}" for i in range(200))
+logger = logging.getLogger("tests")
+
+
+def test_find_duplicate_excludes_own_urls():
+    signature = minhash_signature(CONTENT)
+    index = NearDuplicateIndex()
+    index.add("https://example.com/a", signature)
+    assert index.find_duplicate(signature, exclude={"https://example.com/a"}) is None
+    assert index.find_duplicate(signature) == ("https://example.com/a", False)
+
+
+@pytest.mark.parametrize("skip_previous", [False, True])
+def test_recurring_url_is_neither_flagged_nor_skipped(cache_dir, monkeypatch, skip_previous):
+    async def fetch_article_content(logger, url, method=None):
+        return "httpx", CONTENT
+
+    async def process_article(article):
+        return {
+            "metadata": {"source": article["url"]},
+            "logging": {"status": "Accepted", "retry": False},
+        }
+
+    monkeypatch.setattr(report_controller, "fetch_article_content", fetch_article_content)
+    monkeypatch.setattr(report_controller, "process_article", process_article)
+    monkeypatch.setattr(report_controller, "NEAR_DUP_SKIP_PREVIOUS", skip_previous)
+
+    def run(run_id):
+        articles = [{"url": "http://x/1", "canonical_url": "http://x/1", "title": "x"}]
+        return asyncio.run(
+            report_controller.scrape_and_process(logger, articles, run_id=run_id)
+        )
+
+    run("run-1")
+    results = run("run-2")
+    assert len(results) == 1
+    assert "previously_seen_as" not in results[0]["metadata"]
+
+
+def test_minhash_signature_of_long_page_matches_unblocked(monkeypatch):
+    rng = np.random.default_rng(0)
+    content = " ".join(f"w{n}" for n in rng.integers(0, 5000, 3 * dedup_service.MINHASH_BLOCK))
+    blocked = dedup_service.minhash_signature(content)
+    monkeypatch.setattr(dedup_service, "MINHASH_BLOCK", 10**9)
+    assert np.array_equal(blocked, dedup_service.minhash_signature(content))
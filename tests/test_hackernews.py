@@ -0,0 +1,25 @@
+import asyncio
+import logging
+from services import hackernews_service
+
+logger = logging.getLogger("tests")
+
+
+def test_failed_story_list_keeps_the_others(cache_dir, monkeypatch):
+    lists = {"top": [1, 2], "best": RuntimeError("503 Service Unavailable"), "new": [2, 3]}
+
+    async def fetch_story_ids(logger, list_name):
+        if isinstance(lists[list_name], Exception):
+            raise lists[list_name]
+        return lists[list_name]
+
+    async def fetch_item(logger, semaphore, story_id):
+        return {"id": story_id, "title": f"Story {story_id}", "url": f"https://example.com/{story_id}"}
+
+    monkeypatch.setattr(hackernews_service, "_fetch_story_ids", fetch_story_ids)
+    monkeypatch.setattr(hackernews_service, "_fetch_item", fetch_item)
+
+    stories = asyncio.run(
+        hackernews_service.fetch_hackernews_top_stories(logger, story_lists=["top", "best", "new"])
+    )
+    assert [story["title"] for story in stories] == ["Story 1", "Story 2", "Story 3"]
@@ -0,0 +1,49 @@
+from pathlib import Path
+import pytest
+from services import html_extractor_service
+
+CORPUS_DIR = Path(__file__).resolve().parent.parent / "benchmarks" / "corpus" / "html"
+PAGES = sorted(CORPUS_DIR.glob("*.html"))
+
+pytestmark = pytest.mark.skipif(
+    not html_extractor_service.LXML_AVAILABLE, reason="lxml is not installed"
+)
+
+
+@pytest.mark.parametrize("page", PAGES, ids=[page.name for page in PAGES])
+def test_lxml_matches_beautifulsoup_on_corpus(page):
+    html = page.read_text(encoding="utf-8")
+    assert html_extractor_service.extract_with_lxml(
+        html
+    ) == html_extractor_service.extract_with_beautifulsoup(html)
+
+
+@pytest.mark.parametrize("html", ["", "   ", "\n\t\n", "<!-- nothing -->"])
+def test_blank_pages_have_no_paragraphs(html):
+    assert html_extractor_service.extract_with_beautifulsoup(html) == ""
+    assert html_extractor_service.extract_with_lxml(html) == ""
+
+
+@pytest.mark.parametrize(
+    "html",
+    [
+        # Block elements inside a paragraph: lxml closes the <p> at the <div>
+        "<p>x<div>y</div>z</p>",
+        "<p>a<table><tr><td>t</td></tr></table>b</p>",
+        "<p>a<ul><li>i</li></ul></p>",
+        # Unclosed paragraphs, which html.parser nests
+        "<p>a<p>b",
+        "<div><p>a</div><p>b</p>",
+        "<b><p>a</b>b</p>",
+        # Stray text that libxml2 wraps in a paragraph of its own
+        "<html><head><title>t</title></head>stray<body><p>a</p></body></html>",
+        # Whitespace-only strings, which BeautifulSoup collapses outside <pre>
+        "<p>flags\n  <code>-O2</code>\n  <code>-g</code>.</p>",
+        "<pre><p>  <b>a</b>\n  <b>b</b></p></pre>",
+        "<P>Upper <TT\n>case</TT\n> tags</P>",
+    ],
+)
+def test_lxml_matches_beautifulsoup_on_malformed_markup(html):
+    assert html_extractor_service.extract_with_lxml(
+        html
+    ) == html_extractor_service.extract_with_beautifulsoup(html)
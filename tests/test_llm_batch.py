@@ -0,0 +1,164 @@
+import asyncio
+import json
+import logging
+import re
+import httpx
+import pytest
+from services import llm_batch_service, metrics_service
+from services.llm_batch_service import OpenAIBatchEndpoint
+
+logger = logging.getLogger("tests")
+
+
+class StandInBatchServer:
+    """In-process stand-in for the OpenAI Files and Batches API.
+
+    Requests whose prompt contains "fail" get an error row; with
+    final_status="expired" every other request is left out of the output.
+    """
+
+    def __init__(self, final_status="completed"):
+        self.final_status = final_status
+        self.files = {}
+        self.batches = {}
+        self.polls = 0
+        self.cancelled = []
+
+    def _batch(self, batch_id):
+        batch = self.batches[batch_id]
+        return {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": llm_batch_service.BATCH_REQUEST_URL,
+            "input_file_id": batch["input_file_id"],
+            "completion_window": "24h",
+            "created_at": 0,
+            "status": batch["status"],
+            "output_file_id": batch.get("output_file_id"),
+        }
+
+    def _run(self, batch_id):
+        batch = self.batches[batch_id]
+        lines = []
+        requests = self.files[batch["input_file_id"]].splitlines()
+        for position, line in enumerate(requests):
+            request = json.loads(line)
+            if self.final_status == "expired" and position % 2:
+                continue
+            prompt = request["body"]["messages"][-1]["content"]
+            if "fail" in prompt:
+                response = {"status_code": 500, "body": {"error": {"message": "server error"}}}
+            else:
+                response = {
+                    "status_code": 200,
+                    "body": {
+                        "model": request["body"]["model"],
+                        "choices": [{"message": {"content": f"echo: {prompt}"}}],
+                        "usage": {"prompt_tokens": 1000, "completion_tokens": 100},
+                    },
+                }
+            lines.append(json.dumps({"custom_id": request["custom_id"], "response": response}))
+        output_id = f"file-out-{batch_id}"
+        self.files[output_id] = "\n".join(lines) + "\n"
+        batch["status"] = self.final_status
+        batch["output_file_id"] = output_id
+
+    def handle(self, request):
+        path = request.url.path
+        if request.method == "POST" and path.endswith("/files"):
+            file_id = f"file-{len(self.files)}"
+            body = request.content.decode("utf-8")
+            self.files[file_id] = "\n".join(
+                line for line in body.splitlines() if line.startswith('{"custom_id"')
+            )
+            return httpx.Response(
+                200,
+                json={
+                    "id": file_id,
+                    "object": "file",
+                    "bytes": len(body),
+                    "created_at": 0,
+                    "filename": "batch.jsonl",
+                    "purpose": "batch",
+                    "status": "processed",
+                },
+            )
+        if request.method == "POST" and path.endswith("/batches"):
+            batch_id = f"batch-{len(self.batches)}"
+            input_file_id = json.loads(request.content)["input_file_id"]
+            self.batches[batch_id] = {"input_file_id": input_file_id, "status": "validating"}
+            return httpx.Response(200, json=self._batch(batch_id))
+        match = re.search(r"/batches/([^/]+)(/cancel)?$", path)
+        if match:
+            batch_id = match.group(1)
+            if match.group(2):
+                self.cancelled.append(batch_id)
+                self.batches[batch_id]["status"] = "cancelling"
+            else:
+                self.polls += 1
+                if self.polls == 1:
+                    self.batches[batch_id]["status"] = "in_progress"
+                elif self.batches[batch_id]["status"] == "in_progress":
+                    self._run(batch_id)
+            return httpx.Response(200, json=self._batch(batch_id))
+        match = re.search(r"/files/([^/]+)/content$", path)
+        if match:
+            return httpx.Response(200, text=self.files[match.group(1)])
+        return httpx.Response(404, json={"error": {"message": f"no route for {path}"}})
+
+
+def _requests(*prompts):
+    return [
+        llm_batch_service.build_request(
+            str(index),
+            {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": prompt}]},
+        )
+        for index, prompt in enumerate(prompts)
+    ]
+
+
+def _run_batch(server, requests):
+    async def run():
+        http_client = httpx.AsyncClient(transport=httpx.MockTransport(server.handle))
+        endpoint = OpenAIBatchEndpoint(
+            base_url="http://stand-in/v1", api_key="test", http_client=http_client
+        )
+        try:
+            return await llm_batch_service.run_batch(logger, requests, endpoint)
+        finally:
+            await endpoint.close()
+
+    return asyncio.run(run())
+
+
+@pytest.fixture(autouse=True)
+def batch_dir(cache_dir, monkeypatch):
+    monkeypatch.setattr(llm_batch_service, "BATCH_DIR", cache_dir / "batches")
+    monkeypatch.setattr(llm_batch_service, "LLM_BATCH_POLL_INTERVAL", 0)
+
+
+def test_results_map_to_requests_and_failed_rows_are_none(cache_dir):
+    server = StandInBatchServer()
+    with metrics_service.track_run("batch-test") as run:
+        outputs = _run_batch(server, _requests("first", "please fail", "third"))
+
+    assert outputs == {"0": "echo: first", "1": None, "2": "echo: third"}
+    assert server.polls == 2
+    # Only the two successful rows carry usage, billed at the batch price
+    assert run.tokens == {"prompt": 2000, "completion": 200}
+    expected_cost = 2 * metrics_service.estimate_cost("gpt-4o-mini", 1000, 100)
+    assert run.cost_usd == pytest.approx(expected_cost * llm_batch_service.BATCH_PRICE_FACTOR)
+
+
+def test_expired_batch_returns_completed_requests():
+    server = StandInBatchServer(final_status="expired")
+    outputs = _run_batch(server, _requests("first", "second", "third"))
+    # The missing request falls back to online processing in the caller
+    assert outputs == {"0": "echo: first", "2": "echo: third"}
+
+
+def test_batch_that_never_finishes_is_cancelled(monkeypatch):
+    server = StandInBatchServer()
+    monkeypatch.setattr(llm_batch_service, "LLM_BATCH_TIMEOUT", 0)
+    assert _run_batch(server, _requests("first")) == {}
+    assert server.cancelled == ["batch-0"]
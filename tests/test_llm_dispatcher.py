@@ -0,0 +1,45 @@
+import asyncio
+from contextlib import aclosing
+from langchain_core.messages import AIMessageChunk
+from services import llm_dispatcher_service
+from services.llm_dispatcher_service import LLMDispatcher
+
+
+class FakeStreamingLLM:
+    def __init__(self, first_token_delay, chunk_delay, chunks):
+        self.first_token_delay = first_token_delay
+        self.chunk_delay = chunk_delay
+        self.chunks = chunks
+
+    async def astream(self, messages):
+        await asyncio.sleep(self.first_token_delay)
+        for index in range(self.chunks):
+            if index:
+                await asyncio.sleep(self.chunk_delay)
+            yield AIMessageChunk(content="token ")
+
+
+def _stream(dispatcher, llm):
+    async def consume():
+        messages = [{"role": "user", "content": "question"}]
+        async with aclosing(dispatcher.astream(llm, messages)) as stream:
+            async for _ in stream:
+                pass
+
+    asyncio.run(consume())
+
+
+def test_long_stream_with_fast_first_token_grows_concurrency(monkeypatch):
+    monkeypatch.setattr(llm_dispatcher_service, "LLM_FIRST_TOKEN_TARGET", 0.05)
+    monkeypatch.setattr(llm_dispatcher_service, "LLM_LATENCY_TARGET", 0.05)
+    dispatcher = LLMDispatcher(initial=4)
+    # The whole generation takes well over both targets
+    _stream(dispatcher, FakeStreamingLLM(first_token_delay=0, chunk_delay=0.02, chunks=6))
+    assert dispatcher.limit > 4
+
+
+def test_slow_first_token_shrinks_concurrency(monkeypatch):
+    monkeypatch.setattr(llm_dispatcher_service, "LLM_FIRST_TOKEN_TARGET", 0.05)
+    dispatcher = LLMDispatcher(initial=4)
+    _stream(dispatcher, FakeStreamingLLM(first_token_delay=0.1, chunk_delay=0, chunks=1))
+    assert dispatcher.limit < 4
@@ -0,0 +1,48 @@
+import asyncio
+from langchain_core.messages import AIMessageChunk
+from services import rag_cache_service, rag_service
+
+QUESTION = "What happened in AI this week?"
+
+
+def _ask(question):
+    async def collect():
+        return "".join([part async for part in rag_service.stream_query_articles(question)])
+
+    return asyncio.run(collect())
+
+
+def test_category_filters_get_separate_answers(monkeypatch):
+    calls = []
+
+    async def embed_question(question):
+        # The filter barely moves a real embedding; here it does not at all
+        return [1.0, 0.0, 0.0]
+
+    async def retrieve_documents(query_vector, top_k=5):
+        return []
+
+    async def astream(llm, messages):
+        calls.append(messages)
+        yield AIMessageChunk(content=f"answer {len(calls)}")
+
+    monkeypatch.setattr(rag_service, "embed_question", embed_question)
+    monkeypatch.setattr(rag_service, "retrieve_documents", retrieve_documents)
+    monkeypatch.setattr(rag_service.dispatcher, "astream", astream)
+    monkeypatch.setattr(rag_cache_service, "answers", rag_cache_service.AnswerCache())
+
+    security = _ask(f"{QUESTION}\nTell me about these categories only: Security, Cloud")
+    hardware = _ask(f"{QUESTION}\nTell me about these categories only: Hardware")
+    assert (security, hardware) == ("answer 1", "answer 2")
+
+    # Same categories in another order reuse the first answer
+    assert _ask(f"{QUESTION}\nTell me about these categories only: cloud, security") == "answer 1"
+    assert _ask(QUESTION) == "answer 3"
+    assert len(calls) == 3
+
+
+def test_question_scope():
+    assert rag_cache_service.question_scope(QUESTION) is None
+    assert rag_cache_service.question_scope(
+        f"{QUESTION}\nTell me about these categories only: AI,  Cloud Computing"
+    ) == frozenset({"ai", "cloud computing"})
@@ -0,0 +1,97 @@
+import asyncio
+import json
+import time
+import numpy as np
+import pytest
+from services import rag_service
+
+
+def _write_report(path, sources):
+    entries = [
+        {
+            "metadata": {"source": source, "title": source, "content": f"Article about {source}."},
+            "logging": {"status": "Accepted"},
+        }
+        for source in sources
+    ]
+    path.write_text(json.dumps(entries), encoding="utf-8")
+
+
+def _fake_embeddings(chunks, logger=None):
+    return {
+        chunk: np.random.default_rng(int(chunk[:8], 16)).random(
+            rag_service.EMBEDDING_DIMENSION, dtype=np.float32
+        )
+        for chunk in chunks
+    }
+
+
+@pytest.fixture
+def report(cache_dir, tmp_path, monkeypatch):
+    """Path of the only report, indexed into a fresh vectorstore."""
+    path = tmp_path / "report.json"
+    monkeypatch.setattr(rag_service, "VECTORSTORE_DIR", cache_dir / "vectorstore")
+    monkeypatch.setattr(rag_service, "embed_chunks", _fake_embeddings)
+    monkeypatch.setattr(
+        rag_service.json_logger_service, "get_recent_json_files", lambda limit: [path]
+    )
+    rag_service.initialize_vectorstore()
+    return path
+
+
+def _indexed_sources():
+    documents = rag_service.vectorstore.docstore._dict.values()
+    return sorted(document.metadata["source"] for document in documents)
+
+
+def test_reindexing_the_same_report_changes_nothing(report):
+    sources = [f"https://example.com/{i}" for i in range(3)]
+    _write_report(report, sources)
+    rag_service.index_articles_from_json()
+    version = rag_service.index_version
+    rag_service.index_articles_from_json()
+    assert _indexed_sources() == sources
+    assert rag_service.index_version == version
+
+
+def test_removal_only_pass(report):
+    sources = [f"https://example.com/{i}" for i in range(3)]
+    _write_report(report, sources)
+    rag_service.index_articles_from_json()
+    _write_report(report, sources[:2])
+    rag_service.index_articles_from_json()
+    assert _indexed_sources() == sources[:2]
+
+
+def test_searches_only_see_complete_indexes(report, monkeypatch):
+    query = np.ones(rag_service.EMBEDDING_DIMENSION, dtype=np.float32)
+
+    async def search_while_indexing(sources):
+        _write_report(report, sources)
+        indexing = asyncio.create_task(
+            asyncio.to_thread(rag_service.index_articles_from_json)
+        )
+        counts = []
+        while not indexing.done():
+            counts.append(len(await rag_service.retrieve_documents(query, top_k=100)))
+            await asyncio.sleep(0)
+        await indexing
+        counts.append(len(await rag_service.retrieve_documents(query, top_k=100)))
+        return counts
+
+    first = [f"https://example.com/{i}" for i in range(50)]
+    assert set(asyncio.run(search_while_indexing(first))) <= {0, 50}
+
+    # Linger between removing stale chunks and adding new ones
+    delete = rag_service.vectorstore.delete
+
+    def slow_delete(ids):
+        result = delete(ids)
+        time.sleep(0.2)
+        return result
+
+    monkeypatch.setattr(rag_service.vectorstore, "delete", slow_delete)
+    counts = asyncio.run(search_while_indexing(first[25:] + ["https://example.com/new"]))
+    assert set(counts) <= {50, 26}
+    assert counts[-1] == 26
+
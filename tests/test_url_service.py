@@ -0,0 +1,45 @@
+import pytest
+from services.url_service import canonicalize_url
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        # AMP host prefix only when a site remains after it
+        ("https://amp.example.com/story", "https://example.com/story"),
+        ("https://amp.dev/documentation", "https://amp.dev/documentation"),
+        ("https://amp.co.uk/page", "https://amp.co.uk/page"),
+        ("https://amp.bbc.co.uk/news/1", "https://bbc.co.uk/news/1"),
+        # Only a leading or trailing /amp segment
+        ("https://example.com/amp/story", "https://example.com/story"),
+        ("https://example.com/story/amp", "https://example.com/story"),
+        ("https://example.com/story/amp/", "https://example.com/story"),
+        ("https://example.com/news/amp/story", "https://example.com/news/amp/story"),
+        ("https://example.com/amplifiers", "https://example.com/amplifiers"),
+        # Tracking parameters go, real ones stay
+        (
+            "https://example.com/a?utm_source=x&utm_medium=y&fbclid=1&gclid=2&id=5",
+            "https://example.com/a?id=5",
+        ),
+        (
+            "https://github.com/org/repo/blob/file.py?ref=main",
+            "https://github.com/org/repo/blob/file.py?ref=main",
+        ),
+        ("https://example.com/a?outputType=amp", "https://example.com/a?outputType=amp"),
+        # Unchanged behaviour
+        ("HTTPS://WWW.Example.com:443//a//b/?b=2&a=1#frag", "https://example.com/a/b?a=1&b=2"),
+        (
+            "https://www-example-com.cdn.ampproject.org/c/s/www.example.com/article",
+            "https://example.com/article",
+        ),
+    ],
+)
+def test_canonicalize_url(url, expected):
+    assert canonicalize_url(url) == expected
+
+
+@pytest.mark.parametrize(
+    "url", ["http://a.com:99999/", "http://a.com:port/", "http://[::1/page"]
+)
+def test_malformed_urls_are_returned_unchanged(url):
+    assert canonicalize_url(url) == url
@@ -0,0 +1,44 @@
+import asyncio
+import json
+import pytest
+from langchain_core.messages import AIMessage
+from services import llm_service
+
+
+@pytest.fixture
+def model_reply(monkeypatch):
+    def reply(results):
+        async def ainvoke(llm, messages, **kwargs):
+            return AIMessage(content=json.dumps({"results": results}))
+
+        monkeypatch.setattr(llm_service.dispatcher, "ainvoke", ainvoke)
+
+    return reply
+
+
+def test_string_ids_are_matched(model_reply):
+    model_reply(
+        [
+            {"id": "1", "is_article": False, "reason": "section page"},
+            {"id": 2, "is_article": True, "reason": "article"},
+        ]
+    )
+    results = asyncio.run(
+        llm_service.validate_article_urls(
+            [("https://example.com/news/", "News"), ("https://example.com/a/b", "Story")]
+        )
+    )
+    assert results == [(False, "section page"), (True, "article")]
+
+
+def test_unparseable_and_unknown_ids_give_no_verdict(model_reply):
+    model_reply(
+        [
+            {"id": "first", "is_article": False, "reason": "bad id"},
+            {"id": 7, "is_article": False, "reason": "out of range"},
+        ]
+    )
+    results = asyncio.run(
+        llm_service.validate_article_urls([("https://example.com/news/", "News")])
+    )
+    assert results == [None]
@@ -0,0 +1,20 @@
+import faiss
+import numpy as np
+import pytest
+from services import vector_index_service
+
+
+def test_pq_m_must_divide_the_dimension(monkeypatch):
+    monkeypatch.setattr(vector_index_service, "FAISS_PQ_M", 384)
+    training = np.zeros((300, 1000), dtype=np.float32)
+    with pytest.raises(ValueError, match="FAISS_PQ_M=384 must divide the embedding dimension 1000"):
+        vector_index_service.build_index(1000, "ivf_pq", "l2", training)
+
+
+def test_ivf_pq_skips_polysemous_training(monkeypatch):
+    monkeypatch.setattr(vector_index_service, "FAISS_PQ_M", 8)
+    training = np.random.default_rng(0).random((400, 32), dtype=np.float32)
+    index = vector_index_service.build_index(32, "ivf_pq", "l2", training)
+    ivf = faiss.downcast_index(faiss.extract_index_ivf(index))
+    assert index.is_trained
+    assert not ivf.do_polysemous_training